@@ -0,0 +1,278 @@
+"""
+JSON API для чтения лент и постов.
+
+Ответ отдаётся через StreamingHttpResponse: строки читаются из базы
+итератором по values_list и сериализуются по мере чтения, поэтому
+память не зависит от размера страницы и числа комментариев.
+
+Параметры запросов:
+    ?fields=id,text,...  - какие поля поста вернуть (по умолчанию все);
+    ?limit=N             - размер страницы, не больше API_MAX_LIMIT;
+    ?cursor=...          - курсор из поля "next" предыдущей страницы.
+Курсоры те же, что у HTML-лент: keyset по (pub_date, id). Поле "newest"
+- курсор первого поста страницы: с ним .../new/?since=... отвечает,
+сколько с тех пор появилось новых постов.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import (Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
+from django.shortcuts import get_object_or_404
+
+from . import timeline
+from .models import Comment, Group, Post, User
+from .paginators import (COMMENT_ORDERING, POST_ORDERING, TIMELINE_ORDERING,
+                         InvalidCursor, newer, pack_cursor, seek)
+
+# Поле ответа: (колонка для values_list, преобразование значения).
+POST_FIELDS = {
+    'id': ('id', None),
+    'text': ('text', None),
+    'pub_date': ('pub_date', 'isoformat'),
+    'author': ('author__username', None),
+    'group': ('group__slug', None),
+    'image': ('image', 'url'),
+    'comments_count': ('comments_count', None),
+}
+COMMENT_FIELDS = {
+    'id': ('id', None),
+    'author': ('author__username', None),
+    'text': ('text', None),
+    'created': ('created', 'isoformat'),
+}
+# Строк в одном куске потока.
+CHUNK_ROWS = 100
+# Курсор длиннее точно битый, а в ключ кэша он попадает целиком.
+MAX_CURSOR_LENGTH = 200
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def _convert(value, how):
+    if value is None or how is None:
+        return value
+    if how == 'isoformat':
+        return value.isoformat()
+    return default_storage.url(value) if value else None
+
+
+def _fields(request, available):
+    names = request.GET.get('fields')
+    if not names:
+        return list(available)
+    names = [name for name in names.split(',') if name]
+    unknown = set(names) - set(available)
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(sorted(unknown))}.')
+    return names
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.PER_PAGE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом.')
+    return max(1, min(limit, settings.API_MAX_LIMIT))
+
+
+def _rows(queryset, names, available, prefix='', extra=()):
+    """
+    Итератор кортежей (значения полей..., значения extra...) без
+    создания моделей. Запрос привязывается к базе сейчас, внутри
+    запроса, а не когда поток дойдёт до него.
+    """
+    columns = [prefix + available[name][0] for name in names]
+    return queryset.using(queryset.db).values_list(
+        *columns, *extra
+    ).iterator(chunk_size=CHUNK_ROWS)
+
+
+def _objects(rows, names, available):
+    """Сериализует строки в JSON-объекты, по CHUNK_ROWS строк в куске."""
+    converters = [available[name][1] for name in names]
+    chunk = []
+    for index, row in enumerate(rows):
+        chunk.append(('' if index == 0 else ',') + json.dumps(
+            {
+                name: _convert(value, how)
+                for name, value, how in zip(names, row, converters)
+            },
+            ensure_ascii=False
+        ))
+        if len(chunk) == CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _page(queryset, request, ordering, prefix=''):
+    names = _fields(request, POST_FIELDS)
+    limit = _limit(request)
+    queryset = queryset.order_by(*ordering)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            queryset = seek(queryset, cursor, ordering)
+        except InvalidCursor:
+            raise BadRequest('Неверный курсор.')
+    keys = [name.lstrip('-') for name in ordering]
+    rows = _rows(queryset[:limit + 1], names, POST_FIELDS, prefix, keys)
+    state = {'next': None, 'newest': None}
+
+    def page_rows():
+        last = None
+        for index, row in enumerate(rows):
+            if index == 0:
+                state['newest'] = pack_cursor(
+                    'prev', [str(value) for value in row[len(names):]]
+                )
+            if index == limit:
+                state['next'] = pack_cursor(
+                    'next', [str(value) for value in last[len(names):]]
+                )
+                return
+            last = row
+            yield row
+
+    def stream():
+        yield '{"results":['
+        yield from _objects(page_rows(), names, POST_FIELDS)
+        yield '],"next":' + json.dumps(state['next'])
+        yield ',"newest":' + json.dumps(state['newest']) + '}'
+
+    return stream()
+
+
+def _new_posts(request, key, find):
+    """
+    Число и id постов новее курсора ?since=, самые новые первыми.
+    Ответ кэшируется на NEW_POSTS_TIMEOUT секунд: все, кто опрашивает
+    ленту с одним курсором, получают его из кэша без запросов к базе.
+    """
+    since = request.GET.get('since', '')
+    if len(since) > MAX_CURSOR_LENGTH:
+        raise BadRequest('Неверный курсор.')
+    key = f'new-posts:{key}:{since}'
+    ids = cache.get(key)
+    if ids is None:
+        try:
+            ids = find(since, settings.NEW_POSTS_LIMIT + 1)
+        except InvalidCursor:
+            raise BadRequest('Неверный курсор.')
+        cache.set(key, ids, settings.NEW_POSTS_TIMEOUT)
+    return JsonResponse({
+        'count': min(len(ids), settings.NEW_POSTS_LIMIT),
+        'more': len(ids) > settings.NEW_POSTS_LIMIT,
+        'ids': ids[:settings.NEW_POSTS_LIMIT],
+    })
+
+
+def api_view(view):
+    """Отдаёт куски JSON, которые вернул view, потоком; ошибки - JSON."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            result = view(request, *args, **kwargs)
+        except BadRequest as error:
+            return _error(400, str(error))
+        except Http404:
+            return _error(404, 'Не найдено.')
+        if isinstance(result, HttpResponse):
+            return result
+        return StreamingHttpResponse(
+            result, content_type='application/json; charset=utf-8'
+        )
+    return wrapper
+
+
+@api_view
+def index(request):
+    return _page(Post.objects.all(), request, POST_ORDERING)
+
+
+@api_view
+def index_new(request):
+    return _new_posts(
+        request, 'index',
+        lambda since, limit: list(
+            newer(Post.objects.all(), since, POST_ORDERING).values_list(
+                'id', flat=True
+            )[:limit]
+        )
+    )
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _page(group.posts.all(), request, POST_ORDERING)
+
+
+@api_view
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return _page(author.posts.all(), request, POST_ORDERING)
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _error(401, 'Нужно войти.')
+    return _page(
+        timeline.feed(request.user), request, TIMELINE_ORDERING,
+        prefix='post__'
+    )
+
+
+@api_view
+def follow_new(request):
+    if not request.user.is_authenticated:
+        return _error(401, 'Нужно войти.')
+    return _new_posts(
+        request, f'follow:{request.user.pk}',
+        lambda since, limit: timeline.newer_posts(request.user, since, limit)
+    )
+
+
+@api_view
+def post_view(request, post_id):
+    names = _fields(request, {**POST_FIELDS, 'comments': None})
+    post_names = [name for name in names if name != 'comments']
+    post = next(_rows(
+        Post.objects.filter(id=post_id), post_names, POST_FIELDS,
+        extra=('id',)
+    ), None)
+    if post is None:
+        raise Http404
+    body = json.dumps(
+        {
+            name: _convert(value, POST_FIELDS[name][1])
+            for name, value in zip(post_names, post)
+        },
+        ensure_ascii=False
+    )
+    if 'comments' not in names:
+        return iter([body])
+    comments = _rows(
+        Comment.objects.filter(post_id=post_id).order_by(*COMMENT_ORDERING),
+        list(COMMENT_FIELDS), COMMENT_FIELDS
+    )
+
+    def stream():
+        # Комментарии дописываются последним полем объекта поста.
+        yield body[:-1] + (',' if post_names else '') + '"comments":['
+        yield from _objects(comments, list(COMMENT_FIELDS), COMMENT_FIELDS)
+        yield ']}'
+
+    return stream()
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.index, name='index'),
+    path('posts/new/', api.index_new, name='index_new'),
+    path('posts/<int:post_id>/', api.post_view, name='post'),
+    path('group/<slug:slug>/', api.group_posts, name='group'),
+    path('follow/', api.follow_index, name='follow_index'),
+    path('follow/new/', api.follow_new, name='follow_new'),
+    path('users/<str:username>/', api.profile, name='profile'),
+]
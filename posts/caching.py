@@ -0,0 +1,198 @@
+"""
+Кэш карточек постов и страниц целиком.
+
+Карточка поста кэшируется под ключом, в который входят post.version и
+post.group.version, поэтому устаревшие фрагменты не нужно удалять:
+после изменения поста или группы шаблон просто обращается к новому ключу.
+Страницы для анонимных посетителей так же адресуются счётчиками
+поколений, которые увеличиваются при записи. Из тех же счётчиков
+строится ETag для условных GET-запросов.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode
+
+from yatube.routers import primary
+
+from .models import Group, Post, User
+
+# Параметры запроса, от которых зависят кэшируемые страницы; остальные
+# (метки рекламных кампаний и случайный мусор) не плодят новых ключей.
+PAGE_CACHE_PARAMS = ('page', 'cursor')
+
+
+def bump_post_version(post_id):
+    Post.objects.filter(pk=post_id).update(version=F('version') + 1)
+
+
+def update_group_version(group):
+    """
+    Увеличивает версию группы, если её переименовали. Переименование
+    меняет карточки на всех страницах, поэтому сбрасывает и весь
+    страничный кэш.
+    """
+    if group.pk is None:
+        return
+    old = Group.objects.filter(pk=group.pk).values(
+        'title', 'slug', 'version'
+    ).first()
+    if old is None:
+        return
+    group.version = old['version']
+    if old['title'] != group.title or old['slug'] != group.slug:
+        group.version += 1
+        bump_generations('site')
+
+
+def _generation_key(name):
+    return f'generation:{name}'
+
+
+def _new_generation():
+    # Если счётчик вытеснен из кэша, новое значение всё равно больше
+    # любого из прежних, и старые страницы не оживут.
+    return int(time.time() * 1000)
+
+
+def get_generations(names):
+    keys = [_generation_key(name) for name in names]
+    found = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump_generations(*names):
+    for name in names:
+        key = _generation_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def post_generations(author, group_slugs, post_id):
+    """Поколения страниц, на которых виден пост."""
+    names = ['index', 'trending', f'user:{author}', f'post:{post_id}']
+    names.extend(f'group:{slug}' for slug in group_slugs if slug)
+    return names
+
+
+def invalidate_users(*user_ids):
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True
+    )
+    bump_generations(*(f'user:{username}' for username in usernames))
+
+
+def invalidate_post(post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if row is not None:
+        author, group = row
+        bump_generations(*post_generations(author, [group], post_id))
+
+
+def _page_generations(generations, kwargs, extra=()):
+    return get_generations(
+        ['site'] + [name.format(**kwargs) for name in generations]
+        + list(extra)
+    )
+
+
+def _page_address(request):
+    params = [
+        (name, request.GET[name])
+        for name in PAGE_CACHE_PARAMS if name in request.GET
+    ]
+    if not params:
+        return request.path
+    return f'{request.path}?{urlencode(params)}'
+
+
+def conditional_page(*generations):
+    """
+    Отвечает 304 Not Modified, не вызывая view, если у клиента
+    актуальная версия страницы.
+
+    ETag строится из адреса, пользователя, CSRF-секрета (его токен есть
+    в формах страницы) и счётчиков поколений, как в cache_for_anonymous,
+    плюс поколения самого пользователя: его подписки тоже видны на
+    странице. Всё, что меняет страницу, уже увеличивает счётчики.
+    Проверка стоит одного чтения из кэша и ни одного запроса к БД.
+    ETag слабый: при каждой отрисовке токены в формах маскируются
+    заново.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            viewer = []
+            if request.user.is_authenticated:
+                viewer.append(f'user:{request.user.username}')
+            values = _page_generations(generations, kwargs, viewer)
+            raw = '|'.join(
+                [
+                    request.get_full_path(),
+                    str(request.user.pk),
+                    request.META.get('CSRF_COOKIE', ''),
+                ] + [str(value) for value in values]
+            )
+            etag = f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_for_anonymous(*generations):
+    """
+    Кэширует страницу целиком для анонимных посетителей.
+
+    Ключ строится из пути страницы, параметров из PAGE_CACHE_PARAMS и
+    текущих значений счётчиков поколений; имена поколений
+    подставляются из аргументов view, например 'group:{slug}'. Запись,
+    меняющая страницу, увеличивает счётчик, и следующий запрос
+    попадает в новый ключ. Брошенные ключи доживают до
+    PAGE_CACHE_TIMEOUT. Авторизованные пользователи и ответы с
+    CSRF-токеном в кэш не попадают.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or \
+                    request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            values = _page_generations(generations, kwargs)
+            raw = '|'.join(
+                [_page_address(request)] + [str(value) for value in values]
+            )
+            key = 'page:' + hashlib.md5(raw.encode()).hexdigest()
+            response = cache.get(key)
+            if response is not None:
+                return response
+            # Страница попадёт в кэш под новым поколением, поэтому
+            # её нельзя собирать по отстающей реплике.
+            with primary():
+                response = view(request, *args, **kwargs)
+            if response.status_code == 200 and \
+                    not request.META.get('CSRF_COOKIE_USED') and \
+                    not response.cookies:
+                cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -1,5 +1,7 @@
 import datetime as dt
 
+from django.conf import settings
+
 
 def year(request):
     """
@@ -9,3 +11,12 @@ def year(request):
     return {
         'year': current_year
     }
+
+
+def cache_timeouts(request):
+    """
+    Добавляет время жизни кэшируемых фрагментов шаблонов.
+    """
+    return {
+        'post_card_timeout': settings.POST_CARD_CACHE_TIMEOUT
+    }
@@ -0,0 +1,100 @@
+"""
+Денормализованные счётчики записей, подписчиков, подписок и комментариев.
+
+Счётчики меняются атомарным UPDATE ... SET n = n + 1 в сигналах
+создания и удаления Post, Comment и Follow. Если они всё же разошлись
+с данными, их чинит команда ./manage.py repair_counters.
+"""
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Post
+
+
+def get_stats(user):
+    """Счётчики пользователя; строка создаётся, если её ещё нет."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        stats, _ = AuthorStats.objects.get_or_create(
+            user=user,
+            defaults={
+                'posts_count': user.posts.count(),
+                'followers_count': user.following.count(),
+                'following_count': user.follower.count(),
+            }
+        )
+        return stats
+
+
+def _bump(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def bump_stats(user_id, field, delta):
+    # Если строки счётчиков ещё нет, get_stats создаст её по данным из БД.
+    _bump(AuthorStats.objects.filter(user_id=user_id), field, delta)
+
+
+def bump_comments(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(queryset, key):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{key: OuterRef('pk')}).order_by().values(
+                key
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def recount_posts(user_ids):
+    """Пересчитывает posts_count авторов по данным БД одним запросом."""
+    AuthorStats.objects.filter(user_id__in=user_ids).update(
+        posts_count=_count(Post.objects.all(), 'author')
+    )
+
+
+# (модель, счётчик, модель подсчитываемых строк, ссылка на модель).
+COUNTERS = (
+    ('AuthorStats', 'posts_count', 'Post', 'author'),
+    ('AuthorStats', 'followers_count', 'Follow', 'author'),
+    ('AuthorStats', 'following_count', 'Follow', 'user'),
+    ('Post', 'comments_count', 'Comment', 'post'),
+)
+
+
+def repair(apps=global_apps):
+    """
+    Пересчитывает все счётчики и исправляет разошедшиеся.
+    Возвращает словарь {имя счётчика: число исправленных строк}.
+    Миграции передают в apps исторический реестр моделей.
+    """
+    stats = apps.get_model('posts', 'AuthorStats')
+    stats.objects.bulk_create(
+        (
+            stats(user_id=pk)
+            for pk in apps.get_model(settings.AUTH_USER_MODEL).objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ),
+        ignore_conflicts=True
+    )
+    fixed = {}
+    for name, field, counted, key in COUNTERS:
+        model = apps.get_model('posts', name)
+        queryset = apps.get_model('posts', counted).objects.all()
+        drifted = model.objects.annotate(
+            expected=_count(queryset, key)
+        ).exclude(**{field: F('expected')})
+        fixed[f'{name}.{field}'] = model.objects.filter(
+            pk__in=drifted.values('pk')
+        ).update(**{field: _count(queryset, key)})
+    return fixed
@@ -0,0 +1,28 @@
+"""Низкоуровневые операции с БД в обход ORM."""
+from itertools import islice
+
+from django.db import connection, transaction
+
+
+def insert_rows(model, fields, rows, batch_size):
+    """
+    Вставляет кортежи значений fields пачками по batch_size в обход ORM
+    и сигналов, каждую пачку в своей транзакции. Возвращает число строк.
+    """
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(model._meta.get_field(name).column)
+                        for name in fields)
+    sql = (
+        f'INSERT INTO {qn(model._meta.db_table)} ({columns}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))})'
+    )
+    rows = iter(rows)
+    total = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return total
+            with transaction.atomic():
+                cursor.executemany(sql, batch)
+            total += len(batch)
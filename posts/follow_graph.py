@@ -0,0 +1,150 @@
+"""
+Граф подписок в общем кэше.
+
+Для каждого пользователя хранится отсортированный массив id авторов, на
+которых он подписан (array('I'): 4 байта на подписку, AutoField
+в Django - 32-битный). Проверка "подписан ли A на B" - бинарный поиск
+в массиве, а "на кого из этих авторов подписан A" и массивы сразу
+нескольких пользователей читаются одним обращением к кэшу. Если
+массива нет в кэше, он загружается из Follow одним запросом на всех
+недостающих пользователей.
+
+Сигналы подписки и отписки правят закэшированный массив на месте.
+Ключи содержат счётчик поколения: команда ./manage.py
+rebuild_follow_graph увеличивает его и заново раскладывает массивы
+из Follow, старые ключи вытесняются сами. Одновременные подписки одного
+пользователя могут потерять правку, поэтому массивы живут не дольше
+TIMEOUT.
+"""
+from array import array
+from bisect import bisect_left, insort
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.cache import cache
+
+from . import caching
+from .models import Follow
+
+GENERATION = 'follow-graph'
+TIMEOUT = 60 * 60
+TYPECODE = 'I'
+
+
+def _prefix():
+    generation, = caching.get_generations([GENERATION])
+    return f'{GENERATION}:{generation}:'
+
+
+def _pack(author_ids):
+    return array(TYPECODE, sorted(set(author_ids))).tobytes()
+
+
+def _unpack(data):
+    authors = array(TYPECODE)
+    authors.frombytes(data)
+    return authors
+
+
+def _contains(authors, author_id):
+    index = bisect_left(authors, author_id)
+    return index < len(authors) and authors[index] == author_id
+
+
+def following_many(user_ids):
+    """
+    Словарь {id пользователя: отсортированный массив id авторов}.
+    Одно чтение из кэша и не больше одного запроса к БД.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    prefix = _prefix()
+    found = cache.get_many([f'{prefix}{user_id}' for user_id in user_ids])
+    graph = {
+        user_id: _unpack(found[f'{prefix}{user_id}'])
+        for user_id in user_ids if f'{prefix}{user_id}' in found
+    }
+    missing = user_ids - set(graph)
+    if missing:
+        loaded = {user_id: [] for user_id in missing}
+        for user_id, author_id in Follow.objects.filter(
+            user_id__in=missing
+        ).values_list('user_id', 'author_id'):
+            loaded[user_id].append(author_id)
+        for user_id, author_ids in loaded.items():
+            data = _pack(author_ids)
+            # add, а не set: не затереть массив, который уже положил
+            # другой запрос и, возможно, поправил сигнал.
+            cache.add(f'{prefix}{user_id}', data, TIMEOUT)
+            graph[user_id] = _unpack(data)
+    return graph
+
+
+def following(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id."""
+    return following_many([user_id]).get(user_id, array(TYPECODE))
+
+
+def follows(user_id, author_id):
+    """Подписан ли user_id на author_id."""
+    return _contains(following(user_id), author_id)
+
+
+def followed(user_id, author_ids):
+    """Те из author_ids, на которых подписан user_id."""
+    authors = following(user_id)
+    return {
+        author_id for author_id in author_ids
+        if _contains(authors, author_id)
+    }
+
+
+def _update(user_id, author_id, subscribe):
+    key = f'{_prefix()}{user_id}'
+    data = cache.get(key)
+    if data is None:
+        # Массив загрузится из БД при следующем чтении.
+        return
+    authors = _unpack(data)
+    present = _contains(authors, author_id)
+    if subscribe and not present:
+        insort(authors, author_id)
+    elif not subscribe and present:
+        authors.remove(author_id)
+    else:
+        return
+    cache.set(key, authors.tobytes(), TIMEOUT)
+
+
+def add_follow(user_id, author_id):
+    _update(user_id, author_id, subscribe=True)
+
+
+def remove_follow(user_id, author_id):
+    _update(user_id, author_id, subscribe=False)
+
+
+def rebuild(batch_size=1000):
+    """
+    Раскладывает граф из Follow под новым поколением ключей.
+    Возвращает число пользователей с подписками.
+    """
+    caching.bump_generations(GENERATION)
+    prefix = _prefix()
+    rows = Follow.objects.order_by('user_id', 'author_id').values_list(
+        'user_id', 'author_id'
+    ).iterator(chunk_size=batch_size * 10)
+    users = 0
+    batch = {}
+    for user_id, group in groupby(rows, key=itemgetter(0)):
+        batch[f'{prefix}{user_id}'] = _pack(
+            author_id for _, author_id in group
+        )
+        users += 1
+        if len(batch) >= batch_size:
+            cache.set_many(batch, TIMEOUT)
+            batch = {}
+    if batch:
+        cache.set_many(batch, TIMEOUT)
+    return users
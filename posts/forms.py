@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
+from .images import normalize
 from .models import Comment, Post
 
 User = get_user_model()
@@ -21,6 +23,12 @@ class PostForm(ModelForm):
             'image': 'Прикрепите изображение'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return normalize(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,104 @@
+"""
+Обработка изображений постов при загрузке.
+
+Размер проверяется по заголовку файла, до декодирования пикселей. Затем
+изображение поворачивается по EXIF, теряет метаданные и уменьшается
+до IMAGE_MAX_SIDE, так что в media/posts/ попадает уже обработанный файл
+в исходном формате. Варианты разной ширины для srcset рисует пул
+миниатюр (posts/thumbnails.py).
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps
+
+# Параметры сохранения по форматам; метаданные, кроме цветового
+# профиля, не передаются и поэтому не записываются.
+SAVE_OPTIONS = {
+    'JPEG': {'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'method': 6},
+}
+
+
+def _save_options(image, image_format):
+    options = dict(SAVE_OPTIONS.get(image_format, {}))
+    if image_format in ('JPEG', 'WEBP'):
+        options['quality'] = settings.IMAGE_QUALITY
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if image_format == 'GIF' and 'transparency' in image.info:
+        options['transparency'] = image.info['transparency']
+    return options
+
+
+def normalize(upload):
+    """
+    Проверяет и обрабатывает загруженный файл. Возвращает новый файл
+    с тем же именем или бросает ValidationError.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # Image.open читает только заголовок: пиксели ещё не декодированы.
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Изображение слишком большое: %(width)s×%(height)s.',
+                code='image_too_large',
+                params={'width': width, 'height': height}
+            )
+        if getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        limit = (settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE)
+        # JPEG умеет декодироваться сразу в уменьшенном масштабе.
+        image.draft(image.mode, limit)
+        options = _save_options(image, image_format)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(limit, Image.LANCZOS)
+        content = BytesIO()
+        image.save(content, image_format, **options)
+    return ContentFile(content.getvalue(), name=upload.name)
+
+
+def import_file(media_root, path):
+    """
+    Проверяет и обрабатывает файл при импорте постов, в процессе пула.
+    Ничего не записывает: пост с этим файлом ещё может быть отклонён,
+    сохраняет файл save_import. Имя в хранилище - хеш исходного
+    содержимого, поэтому повторный импорт не создаёт копий. Возвращает
+    (имя, содержимое, None), где содержимое None, если файл уже
+    сохранён, или (None, None, текст ошибки).
+    """
+    try:
+        with open(path, 'rb') as source:
+            data = source.read()
+        extension = os.path.splitext(path)[1].lower()
+        name = f'posts/{hashlib.sha1(data).hexdigest()[:20]}{extension}'
+        if FileSystemStorage(location=media_root).exists(name):
+            return name, None, None
+        image = normalize(ContentFile(data, name=os.path.basename(path)))
+        image.seek(0)
+        return name, image.read(), None
+    except ValidationError as error:
+        return None, None, ' '.join(error.messages)
+    except (OSError, Image.DecompressionBombError, SyntaxError) as error:
+        # Так Pillow сообщает о битых и неизвестных файлах.
+        return None, None, str(error) or error.__class__.__name__
+
+
+def save_import(media_root, name, content):
+    """
+    Сохраняет файл, который подготовил import_file. Возвращает (имя в
+    хранилище, записан ли файл сейчас).
+    """
+    storage = FileSystemStorage(location=media_root)
+    if content is None or storage.exists(name):
+        return name, False
+    return storage.save(name, ContentFile(content)), True
@@ -0,0 +1,310 @@
+"""
+Импорт постов с другой платформы из NDJSON.
+
+Строка файла - JSON-объект:
+    {"id": "42", "author": "leo", "text": "...",
+     "pub_date": "2020-01-01T10:00:00+00:00", "group": "cats",
+     "image": "2020/01/cat.jpg"}
+pub_date, group и image необязательны, image - путь внутри каталога
+изображений. id сохраняется в Post.external_id: уже импортированные
+строки пропускаются, поэтому повторный запуск ничего не задваивает.
+
+Файл читается пачками. Изображения пачки обрабатываются в пуле
+процессов, пока основной процесс разбирает строки и одним запросом
+находит авторов и группы. Файлы записываются только для принятых
+строк, и посты пачки вставляются в одной транзакции.
+Вставка идёт в обход ORM и сигналов (иначе pub_date заменилась бы на
+текущее время), поэтому счётчики, ленты, поиск и кэш страниц
+обновляются отдельно - тоже по пачке.
+"""
+import json
+import os
+from collections import Counter
+from itertools import islice, repeat
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters, search, timeline
+from .db import insert_rows
+from .images import import_file, save_import
+from .models import AuthorStats, Group, Post, User
+from .tasks import create_pool
+
+FIELDS = (
+    'external_id', 'text', 'pub_date', 'author', 'group', 'image',
+    'comments_count', 'version'
+)
+MAX_ID_LENGTH = Post._meta.get_field('external_id').max_length
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def _string(record, key, required=True):
+    value = record.get(key)
+    if value is None or value == '':
+        if required:
+            raise InvalidRecord(f'нет поля {key}')
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str):
+        raise InvalidRecord(f'{key} должно быть строкой')
+    return value
+
+
+def _pub_date(record):
+    value = _string(record, 'pub_date', required=False)
+    if value is None:
+        return timezone.now()
+    try:
+        pub_date = parse_datetime(value)
+    except ValueError:
+        pub_date = None
+    if pub_date is None:
+        raise InvalidRecord('неверная pub_date')
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date)
+    return pub_date
+
+
+def _create_stats(user_ids):
+    """Счётчики новых авторов: bulk_create не вызывает сигнал user_created."""
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+
+
+class Importer:
+    """
+    Импорт в пачках по batch_size. images - каталог изображений;
+    workers - размер пула, 0 - обрабатывать изображения в этом же
+    процессе; create_missing - создавать неизвестных авторов и группы,
+    иначе такие строки считаются ошибочными.
+    """
+
+    def __init__(self, images=None, workers=None, batch_size=1000,
+                 create_missing=False):
+        self.images = os.path.realpath(images) if images else None
+        self.workers = os.cpu_count() if workers is None else workers
+        self.batch_size = batch_size
+        self.create_missing = create_missing
+        self.stats = Counter()
+
+    def _fail(self, number, message, log):
+        self.stats['failed'] += 1
+        if log:
+            log(f'строка {number}: {message}')
+
+    def _image(self, record):
+        """Путь к изображению записи внутри каталога изображений."""
+        image = _string(record, 'image', required=False)
+        if image is None:
+            return None
+        if self.images is None:
+            raise InvalidRecord('изображение без каталога изображений')
+        image = os.path.realpath(os.path.join(self.images, image))
+        if not image.startswith(self.images + os.sep):
+            raise InvalidRecord('изображение вне каталога изображений')
+        return image
+
+    def _parse(self, line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise InvalidRecord('не JSON')
+        if not isinstance(record, dict):
+            raise InvalidRecord('не объект')
+        external_id = _string(record, 'id')
+        if len(external_id) > MAX_ID_LENGTH:
+            raise InvalidRecord(f'id длиннее {MAX_ID_LENGTH} символов')
+        return {
+            'id': external_id,
+            'author': _string(record, 'author'),
+            'text': _string(record, 'text'),
+            'pub_date': _pub_date(record),
+            'group': _string(record, 'group', required=False),
+            'image': self._image(record),
+        }
+
+    def _lookup(self, model, field, values, create, after_create=None):
+        found = dict(
+            model.objects.filter(**{f'{field}__in': values}).values_list(
+                field, 'id'
+            )
+        )
+        missing = set(values) - set(found)
+        if missing and self.create_missing:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    [create(value) for value in sorted(missing)],
+                    ignore_conflicts=True
+                )
+                created = dict(
+                    model.objects.filter(
+                        **{f'{field}__in': missing}
+                    ).values_list(field, 'id')
+                )
+                if after_create:
+                    after_create(created.values())
+            found.update(created)
+        return found
+
+    def _new_records(self, lines, log):
+        """Разобранные строки пачки, которых ещё нет в базе."""
+        records = []
+        seen = set()
+        for number, line in lines:
+            self.stats['read'] += 1
+            try:
+                record = self._parse(line)
+            except InvalidRecord as error:
+                self._fail(number, error, log)
+                continue
+            if record['id'] in seen:
+                self.stats['skipped'] += 1
+                continue
+            seen.add(record['id'])
+            records.append((number, record))
+        existing = set(
+            Post.objects.filter(external_id__in=seen).values_list(
+                'external_id', flat=True
+            )
+        )
+        self.stats['skipped'] += len(existing)
+        return [
+            (number, record) for number, record in records
+            if record['id'] not in existing
+        ]
+
+    def _accepted(self, records, authors, groups, images, log):
+        """Записи, у которых нашлись автор, группа и изображение."""
+        accepted = []
+        for number, record in records:
+            if record['author'] not in authors:
+                self._fail(number, f'нет автора {record["author"]}', log)
+            elif record['group'] and record['group'] not in groups:
+                self._fail(number, f'нет группы {record["group"]}', log)
+            elif record['image'] and number not in images:
+                continue
+            else:
+                accepted.append((number, record))
+        return accepted
+
+    def _import_batch(self, lines, map_images, log):
+        records = self._new_records(lines, log)
+        # Пул начинает работу сразу, результаты забираются ниже.
+        with_images = [
+            (number, record) for number, record in records
+            if record['image']
+        ]
+        results = map_images(
+            import_file, repeat(settings.MEDIA_ROOT),
+            [record['image'] for _, record in with_images]
+        )
+        authors = self._lookup(
+            User, 'username', {record['author'] for _, record in records},
+            lambda username: User(
+                username=username, password=make_password(None)
+            ),
+            after_create=_create_stats
+        )
+        groups = self._lookup(
+            Group, 'slug',
+            {record['group'] for _, record in records if record['group']},
+            lambda slug: Group(title=slug, slug=slug, description='')
+        )
+        images = {}
+        for (number, _), (name, content, error) in zip(with_images, results):
+            if error:
+                self._fail(number, f'изображение: {error}', log)
+            else:
+                images[number] = (name, content)
+        accepted = self._accepted(records, authors, groups, images, log)
+        if accepted:
+            self._insert(accepted, authors, groups, images)
+
+    def _save_images(self, accepted, images):
+        """
+        Сохраняет изображения принятых записей - только теперь, чтобы от
+        отклонённых строк не оставалось файлов. Возвращает (имена по
+        номеру строки, записанные сейчас файлы).
+        """
+        names, written = {}, []
+        for number, _ in accepted:
+            if number not in images:
+                continue
+            name, created = save_import(settings.MEDIA_ROOT, *images[number])
+            names[number] = name
+            if created:
+                written.append(name)
+        self.stats['images'] += len(names)
+        return names, written
+
+    def _insert(self, accepted, authors, groups, images):
+        names, written = self._save_images(accepted, images)
+        adapt = connection.ops.adapt_datetimefield_value
+        rows = [
+            (
+                record['id'], record['text'], adapt(record['pub_date']),
+                authors[record['author']], groups.get(record['group']),
+                names.get(number, ''), 0, 1
+            )
+            for number, record in accepted
+        ]
+        try:
+            self._insert_rows(rows)
+        except Exception:
+            storage = FileSystemStorage(location=settings.MEDIA_ROOT)
+            for name in written:
+                storage.delete(name)
+            raise
+
+    def _insert_rows(self, rows):
+        with transaction.atomic():
+            insert_rows(Post, FIELDS, rows, len(rows))
+            posts = list(
+                Post.objects.filter(
+                    external_id__in=[row[0] for row in rows]
+                ).select_related('author', 'group').only(
+                    'id', 'text', 'pub_date', 'author__username',
+                    'group__slug'
+                )
+            )
+            counters.recount_posts({post.author_id for post in posts})
+            timeline.fan_out_posts(posts)
+            search.index_posts(posts)
+            generations = {'index'}
+            for post in posts:
+                generations.add(f'user:{post.author.username}')
+                if post.group_id is not None:
+                    generations.add(f'group:{post.group.slug}')
+            transaction.on_commit(
+                lambda: caching.bump_generations(*generations)
+            )
+        self.stats['imported'] += len(posts)
+
+    def run(self, lines, log=None):
+        """Импортирует строки NDJSON, возвращает счётчики."""
+        lines = (
+            (number, line) for number, line in enumerate(lines, 1)
+            if line.strip()
+        )
+        pool = create_pool(self.workers) if self.workers else None
+        try:
+            while True:
+                batch = list(islice(lines, self.batch_size))
+                if not batch:
+                    break
+                self._import_batch(batch, pool.map if pool else map, log)
+        finally:
+            if pool:
+                pool.shutdown()
+        return self.stats
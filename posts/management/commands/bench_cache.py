@@ -0,0 +1,79 @@
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = (
+    ('mmap', 'yatube.mmap_cache.MmapCache', 'yatube.cache'),
+    ('locmem', 'django.core.cache.backends.locmem.LocMemCache', 'bench'),
+    ('file', 'django.core.cache.backends.filebased.FileBasedCache', 'files'),
+)
+
+
+def _worker(backend, location, options, seed, queue):
+    cache = import_string(backend)(location, options)
+    rng = random.Random(seed)
+    value = 'x' * options['VALUE_SIZE']
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(options['OPERATIONS']):
+        key = f'key:{rng.randrange(options["KEYS"])}'
+        if rng.random() < options['WRITE_SHARE']:
+            cache.set(key, value)
+        elif cache.get(key) is not None:
+            hits += 1
+    queue.put((time.perf_counter() - started, hits))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность MmapCache, LocMemCache '
+        'и FileBasedCache при нескольких процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=20000)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--value-size', type=int, default=2048)
+        parser.add_argument('--write-share', type=float, default=0.1)
+
+    def handle(self, *args, **options):
+        params = {
+            'OPERATIONS': options['operations'],
+            'KEYS': options['keys'],
+            'VALUE_SIZE': options['value_size'],
+            'WRITE_SHARE': options['write_share'],
+            'OPTIONS': {'MAX_ENTRIES': options['keys'] * 2},
+        }
+        reads = options['operations'] * (1 - options['write_share'])
+        directory = tempfile.mkdtemp()
+        try:
+            for name, backend, location in BACKENDS:
+                location = f'{directory}/{location}'
+                queue = multiprocessing.Queue()
+                workers = [
+                    multiprocessing.Process(
+                        target=_worker,
+                        args=(backend, location, params, seed, queue)
+                    )
+                    for seed in range(options['processes'])
+                ]
+                for worker in workers:
+                    worker.start()
+                results = [queue.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+                elapsed = max(seconds for seconds, _ in results)
+                hits = sum(hits for _, hits in results)
+                total = options['operations'] * len(workers)
+                self.stdout.write(
+                    f'{name:>7}: {total / elapsed:>10.0f} оп/с, '
+                    f'попаданий {hits / (reads * len(workers)):.1%}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,166 @@
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from yatube.settings_production import DATABASES as PRODUCTION
+from yatube.sqlite3.base import apply_pragmas
+
+PROFILES = (
+    # Как Django по умолчанию: журнал отката, соединение на каждый
+    # запрос, отложенные транзакции.
+    ('default', {}, False, 'DEFERRED', 5),
+    (
+        'production',
+        PRODUCTION['default']['OPTIONS']['pragmas'],
+        True,
+        PRODUCTION['default']['OPTIONS']['transaction_mode'],
+        PRODUCTION['default']['OPTIONS']['timeout'],
+    ),
+)
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author INTEGER, '
+    'pub_date REAL, text TEXT, comments INTEGER DEFAULT 0)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+    'CREATE INDEX post_author ON post (author, pub_date)',
+)
+
+
+def _connect(path, pragmas, timeout):
+    connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def _read(connection, rng, params):
+    author = rng.randrange(params['AUTHORS'])
+    connection.execute(
+        'SELECT id, author, pub_date, text FROM post '
+        'ORDER BY pub_date DESC LIMIT 10'
+    ).fetchall()
+    connection.execute(
+        'SELECT COUNT(*) FROM post WHERE author = ?', [author]
+    ).fetchone()
+
+
+def _write(connection, rng, params, mode):
+    # Как сохранение поста с сигналами: чтение, затем запись в одной
+    # транзакции.
+    connection.execute(f'BEGIN {mode}')
+    try:
+        post_id = connection.execute(
+            'SELECT MAX(id) FROM post'
+        ).fetchone()[0]
+        connection.execute(
+            'INSERT INTO post (author, pub_date, text) VALUES (?, ?, ?)',
+            [rng.randrange(params['AUTHORS']), time.time(), 'x' * 200]
+        )
+        connection.execute(
+            'UPDATE post SET comments = comments + 1 WHERE id = ?',
+            [rng.randrange(1, post_id + 1)]
+        )
+        connection.execute('COMMIT')
+    except sqlite3.OperationalError:
+        connection.execute('ROLLBACK')
+        raise
+
+
+def _worker(path, profile, params, seed, queue):
+    _, pragmas, persistent, mode, timeout = profile
+    rng = random.Random(seed)
+    connection = _connect(path, pragmas, timeout) if persistent else None
+    reads = writes = errors = 0
+    started = time.perf_counter()
+    for _ in range(params['OPERATIONS']):
+        if not persistent:
+            connection = _connect(path, pragmas, timeout)
+        try:
+            if rng.random() < params['WRITE_SHARE']:
+                _write(connection, rng, params, mode)
+                writes += 1
+            else:
+                _read(connection, rng, params)
+                reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+        if not persistent:
+            connection.close()
+    queue.put((time.perf_counter() - started, reads, writes, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite с настройками Django '
+        'по умолчанию и с профилем yatube.settings_production при '
+        'одновременных чтениях и записях из нескольких процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=100)
+        parser.add_argument('--write-share', type=float, default=0.2)
+
+    def _create_database(self, path, pragmas, options):
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.execute(
+            f'PRAGMA journal_mode = {pragmas.get("journal_mode", "DELETE")}'
+        )
+        for statement in SCHEMA:
+            connection.execute(statement)
+        rng = random.Random(0)
+        now = time.time()
+        connection.execute('BEGIN')
+        connection.executemany(
+            'INSERT INTO post (author, pub_date, text) VALUES (?, ?, ?)',
+            (
+                (rng.randrange(options['authors']), now - i, 'x' * 200)
+                for i in range(options['posts'])
+            )
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def handle(self, *args, **options):
+        params = {
+            'OPERATIONS': options['operations'],
+            'AUTHORS': options['authors'],
+            'WRITE_SHARE': options['write_share'],
+        }
+        directory = tempfile.mkdtemp()
+        try:
+            for profile in PROFILES:
+                name, pragmas = profile[:2]
+                path = os.path.join(directory, f'{name}.sqlite3')
+                self._create_database(path, pragmas, options)
+                queue = multiprocessing.Queue()
+                workers = [
+                    multiprocessing.Process(
+                        target=_worker,
+                        args=(path, profile, params, seed, queue)
+                    )
+                    for seed in range(options['processes'])
+                ]
+                for worker in workers:
+                    worker.start()
+                results = [queue.get() for _ in workers]
+                for worker in workers:
+                    worker.join()
+                elapsed = max(seconds for seconds, *_ in results)
+                reads, writes, errors = (
+                    sum(result[i] for result in results) for i in (1, 2, 3)
+                )
+                self.stdout.write(
+                    f'{name:>10}: чтений {reads / elapsed:>8.0f}/с, '
+                    f'записей {writes / elapsed:>7.0f}/с, '
+                    f'ошибок "database is locked": {errors}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
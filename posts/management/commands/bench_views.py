@@ -0,0 +1,256 @@
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from about import urls as about_urls
+from posts import urls as posts_urls
+from posts.models import Group, Post, User
+from posts.seeding import Seeder, load_pragmas
+from users import urls as users_urls
+
+# (urlconf, пространство имён)
+URLCONFS = (
+    (posts_urls, None),
+    (users_urls, None),
+    (about_urls, 'about'),
+)
+# Строка запроса для страниц, которым без неё нечего показывать.
+QUERIES = {'search': {'q': 'город'}}
+# GET этих адресов меняет граф подписок: замеры остальных страниц
+# зависели бы от порядка адресов, поэтому они не замеряются.
+MUTATING = ('profile_follow', 'profile_unfollow')
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Засевает наборы данных нескольких размеров и замеряет '
+        'задержку (p50/p95/p99) и число запросов к БД для каждого URL '
+        'из posts.urls, users.urls и about.urls. Результат пишется '
+        'в JSON; --compare сравнивает его с предыдущим прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,100000',
+            help='Размеры наборов в постах через запятую, '
+                 'например 1000,100000,1000000.'
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--output', default='bench_views.json')
+        parser.add_argument(
+            '--compare', help='JSON предыдущего прогона для сравнения.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        report = {
+            'meta': {
+                'started': datetime.now(timezone.utc).isoformat(),
+                'commit': _commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'sqlite': connection.Database.sqlite_version,
+                'requests': options['requests'],
+                'seed': options['seed'],
+                'skipped': list(MUTATING),
+            },
+            'datasets': [],
+            'results': [],
+        }
+        directory = tempfile.mkdtemp()
+        name = connection.settings_dict['NAME']
+        try:
+            # Замеры чистят кэш - у них свой файл, а не кэш сайта.
+            with override_settings(
+                DEBUG=False,
+                CACHES={'default': dict(
+                    settings.CACHES['default'],
+                    LOCATION=f'{directory}/bench.cache'
+                )}
+            ):
+                for size in sizes:
+                    self._use_database(f'{directory}/bench-{size}.sqlite3')
+                    report['datasets'].append(self._seed(size, options))
+                    report['results'].extend(
+                        self._measure(size, options['requests'])
+                    )
+        finally:
+            self._use_database(name)
+            shutil.rmtree(directory, ignore_errors=True)
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Результаты записаны в {options["output"]}')
+        if options['compare']:
+            with open(options['compare']) as previous:
+                self._compare(json.load(previous), report)
+
+    @staticmethod
+    def _use_database(path):
+        connection.close()
+        connection.settings_dict['NAME'] = path
+
+    def _seed(self, size, options):
+        call_command('migrate', verbosity=0)
+        started = time.perf_counter()
+        with load_pragmas():
+            loaded = Seeder(
+                users=max(10, size // 10),
+                groups=max(5, size // 1000),
+                posts=size,
+                seed=options['seed']
+            ).run(lambda message: self.stdout.write(f'  {message}'))
+        seconds = time.perf_counter() - started
+        self.stdout.write(f'{size} постов засеяно за {seconds:.1f} с')
+        return {'size': size, 'rows': loaded, 'seconds': round(seconds, 1)}
+
+    @staticmethod
+    def _samples():
+        """Значения параметров URL: самые нагруженные автор, пост, группа."""
+        # Самым популярным может оказаться автор без постов, а страницам
+        # поста и комментариев нужен его пост.
+        author = User.objects.filter(
+            pk__in=Post.objects.values('author')
+        ).order_by('-stats__followers_count').first()
+        reader = User.objects.order_by('-stats__following_count').first()
+        group = Group.objects.annotate(total=Count('posts')).order_by(
+            '-total'
+        ).first()
+        if author is None or group is None:
+            raise CommandError(
+                'В базе нет постов или групп, сравнивать нечего'
+            )
+        post = Post.objects.filter(author=author).order_by(
+            '-comments_count'
+        ).first()
+        return author, reader, {
+            'username': author.username,
+            'post_id': post.pk,
+            'slug': group.slug,
+        }
+
+    def _urls(self, kwargs):
+        for urlconf, namespace in URLCONFS:
+            for pattern in urlconf.urlpatterns:
+                if not isinstance(pattern, URLPattern):
+                    continue
+                name = f'{namespace}:{pattern.name}' if namespace \
+                    else pattern.name
+                params = {key: kwargs[key]
+                          for key in pattern.pattern.converters}
+                path = reverse(name, kwargs=params)
+                if name in QUERIES:
+                    path += '?' + urlencode(QUERIES[name])
+                yield name, path
+
+    def _measure(self, size, requests):
+        author, reader, kwargs = self._samples()
+        clients = {'anonymous': Client(), 'reader': Client()}
+        clients['reader'].force_login(reader)
+        # post_edit открывается только автором.
+        clients['author'] = Client()
+        clients['author'].force_login(author)
+        results = []
+        for name, path in self._urls(kwargs):
+            if name in MUTATING:
+                self.stdout.write(
+                    f'{size:>8} {name:<18} пропущен: меняет данные'
+                )
+                continue
+            roles = ('author',) if name == 'post_edit' else (
+                'anonymous', 'reader'
+            )
+            for role in roles:
+                cache.clear()
+                results.append(self._measure_url(
+                    size, name, path, role, clients[role], requests
+                ))
+                result = results[-1]
+                self.stdout.write(
+                    f'{size:>8} {name:<18} {role:<9} '
+                    f'p50 {result["p50_ms"]:>8.2f} мс '
+                    f'p95 {result["p95_ms"]:>8.2f} мс '
+                    f'запросов {result["queries"]:>4} '
+                    f'(холодный {result["cold_queries"]})'
+                )
+        return results
+
+    @staticmethod
+    def _measure_url(size, name, path, role, client, requests):
+        timings, queries = [], []
+        statuses = set()
+        for _ in range(requests + 1):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(path)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            statuses.add(response.status_code)
+        # Первый запрос - с холодным кэшем, он считается отдельно.
+        cold_ms, cold_queries = timings.pop(0), queries.pop(0)
+        return {
+            'size': size,
+            'url': name,
+            'path': path,
+            'client': role,
+            'statuses': sorted(statuses),
+            'cold_ms': round(cold_ms, 3),
+            'cold_queries': cold_queries,
+            'p50_ms': round(_percentile(timings, 0.50), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'p99_ms': round(_percentile(timings, 0.99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(queries),
+        }
+
+    def _compare(self, previous, current):
+        key = ('size', 'url', 'client')
+        before = {
+            tuple(result[field] for field in key): result
+            for result in previous['results']
+        }
+        self.stdout.write(f'Сравнение с {previous["meta"].get("commit")}:')
+        for result in current['results']:
+            old = before.get(tuple(result[field] for field in key))
+            if old is None:
+                continue
+            change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms']
+            mark = ' <-- больше запросов' \
+                if result['queries'] > old['queries'] else ''
+            self.stdout.write(
+                f'{result["size"]:>8} {result["url"]:<18} '
+                f'{result["client"]:<9} p50 {old["p50_ms"]:.2f} -> '
+                f'{result["p50_ms"]:.2f} мс ({change:+.0%}), запросов '
+                f'{old["queries"]} -> {result["queries"]}{mark}'
+            )
@@ -0,0 +1,43 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import tasks, thumbnails
+from posts.models import Post
+
+# Сколько задач на процесс держать в пуле: процессам хватает работы, а
+# память не растёт с числом постов.
+IN_FLIGHT = 4
+
+
+class Command(BaseCommand):
+    help = 'Заранее рисует недостающие миниатюры изображений постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число рабочих процессов (по умолчанию THUMBNAIL_WORKERS).'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None).only(
+            'id', 'image'
+        )
+        workers = options['workers'] or settings.THUMBNAIL_WORKERS
+        rendered = 0
+        running = set()
+        with tasks.create_pool(workers) as pool:
+            for post in posts.iterator():
+                missing = thumbnails.jobs(post)
+                if not missing:
+                    continue
+                if len(running) >= workers * IN_FLIGHT:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    rendered += sum(future.result() for future in done)
+                running.add(pool.submit(
+                    thumbnails.render, settings.MEDIA_ROOT, post.pk,
+                    post.image.name, missing
+                ))
+            rendered += sum(future.result() for future in running)
+        self.stdout.write(f'Нарисовано миниатюр: {rendered}')
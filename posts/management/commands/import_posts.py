@@ -0,0 +1,47 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.importer import Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из NDJSON (можно сжатого gzip) с изображениями '
+        'из каталога. Уже импортированные посты пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Файл NDJSON или NDJSON.gz.')
+        parser.add_argument('--images', help='Каталог изображений.')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Процессов для обработки изображений (по умолчанию по '
+                 'числу ядер, 0 - без пула).'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы.'
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            images=options['images'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            create_missing=options['create_missing'],
+        )
+        opener = gzip.open if options['file'].endswith('.gz') else open
+        started = time.perf_counter()
+        with opener(options['file'], 'rt', encoding='utf-8') as lines:
+            stats = importer.run(lines, log=self.stderr.write)
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'Прочитано {stats["read"]}, импортировано {stats["imported"]} '
+            f'(изображений {stats["images"]}), пропущено уже '
+            f'импортированных {stats["skipped"]}, ошибок {stats["failed"]} '
+            f'за {seconds:.1f} с: {stats["read"] / seconds:.0f} строк/с, '
+            f'{stats["images"] / seconds:.1f} изображений/с.'
+        )
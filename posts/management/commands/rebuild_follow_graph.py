@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.follow_graph import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Заново раскладывает граф подписок в кэше по таблице Follow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f'Граф подписок собран: пользователей {users}.')
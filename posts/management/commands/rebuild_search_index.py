@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов и комментариев.'
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            raise CommandError(
+                'Полнотекстовый поиск работает только с SQLite.'
+            )
+        search.rebuild()
+        self.stdout.write('Индекс поиска пересобран.')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг обсуждаемых постов. Запускается '
+        'по расписанию, например из cron раз в несколько минут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=None,
+            help='Размер рейтинга (по умолчанию TRENDING_SIZE).'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Сначала заново посчитать оценки по свежим комментариям '
+                 '(при первом запуске).'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            posts = trending.rebuild()
+            self.stdout.write(f'Оценки посчитаны для {posts} постов.')
+        ranked = trending.refresh(size=options['size'])
+        self.stdout.write(f'В рейтинге {ranked} постов.')
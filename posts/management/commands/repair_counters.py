@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import repair
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики и исправляет расхождения.'
+
+    def handle(self, *args, **options):
+        for counter, fixed in repair().items():
+            self.stdout.write(f'{counter}: исправлено {fixed}')
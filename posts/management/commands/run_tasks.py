@@ -0,0 +1,35 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from posts.tasks import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет отложенные фоновые задачи. Держится запущенной рядом '
+        'с веб-сервером; SIGTERM дожидается взятых задач и завершает её.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число рабочих процессов (по умолчанию TASK_WORKERS, '
+                 '0 - выполнять в этом процессе).'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            workers=options['workers'],
+            log=lambda message: self.stderr.write(message)
+        )
+        previous = signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+        try:
+            done, errors = worker.run(once=options['once'])
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        self.stdout.write(f'Выполнено задач: {done}, ошибок: {errors}')
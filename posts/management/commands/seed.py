@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seeding import LOAD_PRAGMAS, Seeder, load_pragmas
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками для нагрузочного тестирования. '
+        'Данные добавляются к уже существующим.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--groups', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument(
+            '--follows-per-user', type=float, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--comments-per-post', type=float, default=2,
+            help='Среднее число комментариев к посту.'
+        )
+        parser.add_argument(
+            '--follow-exponent', type=float, default=1.1,
+            help='Показатель степенного закона популярности авторов: '
+                 'чем больше, тем сильнее подписки собираются у немногих.'
+        )
+        parser.add_argument(
+            '--group-exponent', type=float, default=1.2,
+            help='Показатель степенного закона популярности групп.'
+        )
+        parser.add_argument(
+            '--group-share', type=float, default=0.5,
+            help='Доля постов в группах.'
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.1,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--timeline-depth', type=int, default=10,
+            help='Сколько последних постов каждого автора попадает '
+                 'в ленты подписчиков; лента добавляет до '
+                 'подписки * глубина строк. 0 - не заполнять ленты.'
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--safe', action='store_true',
+            help='Не отключать журнал и fsync SQLite и не удалять индексы '
+                 'на время загрузки.'
+        )
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            follows_per_user=options['follows_per_user'],
+            comments_per_post=options['comments_per_post'],
+            follow_exponent=options['follow_exponent'],
+            group_exponent=options['group_exponent'],
+            group_share=options['group_share'],
+            image_share=options['image_share'],
+            days=options['days'],
+            timeline_depth=options['timeline_depth'],
+            defer_indexes=not options['safe'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+        )
+        started = time.perf_counter()
+
+        def log(message):
+            self.stdout.write(
+                f'[{time.perf_counter() - started:7.1f} с] {message}'
+            )
+
+        with load_pragmas({} if options['safe'] else LOAD_PRAGMAS):
+            loaded = seeder.run(log)
+        log(f'Всего строк: {sum(loaded.values())}')
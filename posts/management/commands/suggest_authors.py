@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.suggestions import TOP_K, rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации "кого почитать" по графу подписок. '
+        'Нужны NumPy и SciPy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=TOP_K,
+            help='Сколько авторов хранить для каждого пользователя.'
+        )
+        parser.add_argument(
+            '--max-work', type=int, default=5000000,
+            help='Предел ненулевых элементов произведения на пачку '
+                 'пользователей, ограничивает память.'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild(
+            top_k=options['top_k'],
+            max_work=options['max_work'],
+            log=self.stdout.write if options['verbosity'] > 1 else None
+        )
+        self.stdout.write(
+            f'Рекомендаций {total} за '
+            f'{time.perf_counter() - started:.1f} с.'
+        )
@@ -0,0 +1,71 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    # Один INSERT ... SELECT вместо запроса на каждую подписку: сначала
+    # последние TIMELINE_BACKFILL постов каждого автора, потом
+    # соединение с подписками, как в posts/seeding.py.
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    qn = schema_editor.quote_name
+    schema_editor.execute(
+        f'INSERT INTO {qn(TimelineEntry._meta.db_table)} '
+        '(user_id, post_id, author_id, pub_date) '
+        'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        # Уникальность подписок в этой схеме не гарантирована.
+        'FROM (SELECT DISTINCT user_id, author_id '
+        f'  FROM {qn(Follow._meta.db_table)}) f JOIN ('
+        '  SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+        '    PARTITION BY author_id ORDER BY pub_date DESC'
+        '  ) AS n '
+        f'  FROM {qn(Post._meta.db_table)}'
+        ') p ON p.author_id = f.author_id AND p.n <= %s',
+        [settings.TIMELINE_BACKFILL]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='pull',
+            field=models.BooleanField(default=False, help_text='Посты автора не раскладываются по ленте подписчика при публикации, а подтягиваются при чтении ленты.', verbose_name='читать при запросе'),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-pub_date',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author', 'pub_date'], name='timeline_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+from itertools import islice
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+CREATE_TABLE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+    "text, kind UNINDEXED, post_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+
+
+def _rows(apps):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    for pk, text in Post.objects.values_list('id', 'text').iterator():
+        yield pk * 2, text, 'post', pk
+    for pk, text, post_id in Comment.objects.values_list(
+        'id', 'text', 'post_id'
+    ).iterator():
+        yield pk * 2 + 1, text, 'comment', post_id
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_TABLE)
+    # Строки читаются итератором и пишутся пачками: память не зависит
+    # от числа постов и комментариев.
+    rows = _rows(apps)
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, BATCH_SIZE))
+            if not batch:
+                return
+            cursor.executemany(
+                'INSERT INTO posts_search(rowid, text, kind, post_id) '
+                'VALUES (%s, %s, %s, %s)',
+                batch
+            )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_card_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
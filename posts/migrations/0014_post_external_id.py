@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 05:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='external_id',
+            field=models.CharField(editable=False, help_text='Заполняется при импорте, чтобы не загрузить пост дважды.', max_length=64, null=True, unique=True, verbose_name='id на исходной платформе'),
+        ),
+    ]
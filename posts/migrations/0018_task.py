@@ -0,0 +1,37 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='функция')),
+                ('args', models.TextField(verbose_name='аргументы, JSON')),
+                ('priority', models.SmallIntegerField(default=0, help_text='Задачи с большим приоритетом выполняются раньше.', verbose_name='приоритет')),
+                ('run_after', models.DateTimeField(help_text='Для взятой задачи - когда её можно взять снова.', verbose_name='не раньше')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(verbose_name='всего попыток')),
+                ('lease', models.CharField(blank=True, max_length=32, verbose_name='метка взявшего обработчика')),
+                ('failed', models.BooleanField(default=False, verbose_name='попытки исчерпаны')),
+                ('error', models.TextField(blank=True, verbose_name='последняя ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['failed', 'priority', 'run_after'], name='task_ready_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['lease'], name='task_lease_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='key',
+            field=models.CharField(blank=True, help_text='Пока задача с ключом не выполнена, такая же не ставится.', max_length=200, verbose_name='ключ'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('failed', False), models.Q(_negated=True, key='')), fields=('key',), name='task_unique_key'),
+        ),
+    ]
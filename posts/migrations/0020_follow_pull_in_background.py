@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_task_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='follow',
+            name='pull',
+            field=models.BooleanField(default=False, help_text='Посты автора раскладываются по ленте подписчика не при публикации, а фоновой задачей.', verbose_name='раскладывать в фоне'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.6 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+def mark_pulled_authors(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats.objects.filter(
+        user_id__in=Follow.objects.filter(pull=True).values('author_id')
+    ).update(pull=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_follow_pull_in_background'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='pull',
+            field=models.BooleanField(default=False, help_text='Посты автора не раскладываются по лентам подписчиков, а подмешиваются в ленту при чтении.', verbose_name='читать при открытии ленты'),
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='follow',
+            name='pull',
+        ),
+    ]
@@ -9,6 +9,7 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField(max_length=100)
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return self.title
@@ -43,9 +44,33 @@ class Post(models.Model):
         blank=True,
         null=True
     )
+    comments_count = models.PositiveIntegerField(
+        'количество комментариев',
+        default=0,
+        editable=False
+    )
+    version = models.PositiveIntegerField(default=1, editable=False)
+    external_id = models.CharField(
+        'id на исходной платформе',
+        max_length=64,
+        unique=True,
+        null=True,
+        editable=False,
+        help_text='Заполняется при импорте, чтобы не загрузить пост дважды.'
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -73,6 +98,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -92,3 +123,183 @@ class Follow(models.Model):
 
     class Meta:
         UniqueConstraint(fields=['user', 'author'], name='unique_follower')
+
+
+class AuthorStats(models.Model):
+    """
+    Денормализованные счётчики пользователя, поддерживаются сигналами.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('записей', default=0)
+    followers_count = models.PositiveIntegerField('подписчиков', default=0)
+    following_count = models.PositiveIntegerField('подписок', default=0)
+    pull = models.BooleanField(
+        'читать при открытии ленты',
+        default=False,
+        help_text='Посты автора не раскладываются по лентам подписчиков, '
+                  'а подмешиваются в ленту при чтении.'
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """
+    Материализованная лента подписок: строка на пару (подписчик, пост).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='timeline_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author', 'pub_date'),
+                name='timeline_user_author_idx'
+            ),
+        )
+
+
+class Suggestion(models.Model):
+    """
+    Кого почитать: автор, на которого подписаны подписки пользователя.
+    Таблицу целиком пересчитывает ./manage.py suggest_authors.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.PositiveIntegerField(
+        'подписок пользователя, подписанных на автора'
+    )
+
+    class Meta:
+        ordering = ('-score',)
+        indexes = (
+            models.Index(
+                fields=('user', 'score'),
+                name='suggestion_user_score_idx'
+            ),
+        )
+
+
+class PostHeat(models.Model):
+    """
+    Затухающая оценка обсуждаемости поста: каждый комментарий добавляет
+    единицу, которая вдвое уменьшается за TRENDING_HALF_LIFE. Хранится
+    значение на момент updated, см. posts/trending.py.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='heat'
+    )
+    score = models.FloatField(default=0)
+    updated = models.FloatField('момент оценки, секунды Unix')
+
+
+class TrendingPost(models.Model):
+    """
+    Материализованный рейтинг обсуждаемых постов, пересчитывается
+    по расписанию ./manage.py refresh_trending.
+    """
+    rank = models.PositiveIntegerField(primary_key=True)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ('rank',)
+
+
+class Task(models.Model):
+    """
+    Задача фоновой очереди, см. posts/tasks.py. Выполненная задача
+    удаляется, исчерпавшая попытки остаётся с failed=True и ошибкой.
+    """
+    name = models.CharField('функция', max_length=200)
+    args = models.TextField('аргументы, JSON')
+    priority = models.SmallIntegerField(
+        'приоритет',
+        default=0,
+        help_text='Задачи с большим приоритетом выполняются раньше.'
+    )
+    run_after = models.DateTimeField(
+        'не раньше',
+        help_text='Для взятой задачи - когда её можно взять снова.'
+    )
+    attempts = models.PositiveSmallIntegerField('попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('всего попыток')
+    lease = models.CharField(
+        'метка взявшего обработчика',
+        max_length=32,
+        blank=True
+    )
+    failed = models.BooleanField('попытки исчерпаны', default=False)
+    error = models.TextField('последняя ошибка', blank=True)
+    key = models.CharField(
+        'ключ',
+        max_length=200,
+        blank=True,
+        help_text='Пока задача с ключом не выполнена, такая же не ставится.'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = (
+            UniqueConstraint(
+                fields=('key',),
+                condition=models.Q(failed=False) & ~models.Q(key=''),
+                name='task_unique_key'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('failed', 'priority', 'run_after'),
+                name='task_ready_idx'
+            ),
+            models.Index(fields=('lease',), name='task_lease_idx'),
+        )
+
+    def __str__(self):
+        return self.name
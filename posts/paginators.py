@@ -0,0 +1,253 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+POST_ORDERING = ('-pub_date', '-id')
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+COMMENT_ORDERING = ('-created', '-id')
+TRENDING_ORDERING = ('rank',)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def pack_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачный курсор."""
+    raw = json.dumps([direction] + list(values)).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def unpack_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(cursor + padding)
+        direction, *values = json.loads(raw.decode())
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev'):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+def encode_cursor(obj, ordering, direction):
+    """
+    Упаковывает значения ключей сортировки объекта в непрозрачный курсор.
+    """
+    return pack_cursor(
+        direction,
+        [str(getattr(obj, name.lstrip('-'))) for name in ordering]
+    )
+
+
+def decode_cursor(cursor, model, ordering):
+    direction, values = unpack_cursor(cursor)
+    if len(values) != len(ordering):
+        raise InvalidCursor(cursor)
+    try:
+        values = [
+            model._meta.get_field(name.lstrip('-')).to_python(value)
+            for name, value in zip(ordering, values)
+        ]
+    except Exception:
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+def newest_cursor(rows, ordering):
+    """
+    Курсор первой строки первой страницы ленты, по которому спрашивают
+    о более новых постах; у пустой ленты - пустая строка.
+    """
+    return encode_cursor(rows[0], ordering, 'prev') if rows else ''
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        name[1:] if name.startswith('-') else f'-{name}'
+        for name in ordering
+    )
+
+
+def _keyset_filter(ordering, values):
+    """
+    Условие "строго после курсора" для составного ключа сортировки:
+    (a, b) после (x, y) <=> a < x OR (a = x AND b < y) для убывания.
+    Избыточное a <= x позволяет SQLite искать по индексу диапазоном,
+    а не просматривать все строки до курсора.
+    """
+    condition = Q()
+    equal = {}
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{field}__{lookup}': value})
+        equal[field] = value
+    first = ordering[0]
+    bound = 'lte' if first.startswith('-') else 'gte'
+    return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+
+def seek(queryset, cursor, ordering):
+    """
+    Строки queryset, отсортированные по ordering, строго после курсора
+    "Следующая". Битый курсор - InvalidCursor.
+    """
+    direction, values = decode_cursor(cursor, queryset.model, ordering)
+    if direction != 'next':
+        raise InvalidCursor(cursor)
+    return queryset.filter(_keyset_filter(ordering, values))
+
+
+def newer(queryset, cursor, ordering):
+    """
+    Строки queryset, отсортированные по ordering, строго до позиции
+    курсора, то есть новее её; направление курсора не важно. Пустой
+    курсор - все строки. Битый курсор - InvalidCursor.
+    """
+    queryset = queryset.order_by(*ordering)
+    if not cursor:
+        return queryset
+    _, values = decode_cursor(cursor, queryset.model, ordering)
+    return queryset.filter(
+        _keyset_filter(_reverse_ordering(ordering), values)
+    )
+
+
+class CursorPage(Page):
+    """
+    Страница курсорной пагинации: не знает своего номера и общего
+    количества страниц, зато умеет ссылаться на соседние страницы.
+    """
+    numbered = False
+
+    def __init__(self, rows, paginator, cursor, has_next, has_previous):
+        ordering = paginator.ordering
+        self.cursor = cursor
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.newest_cursor = None
+        if not has_previous:
+            self.newest_cursor = newest_cursor(rows, ordering)
+        if rows and has_next:
+            self.next_cursor = encode_cursor(rows[-1], ordering, 'next')
+        if rows and has_previous:
+            self.previous_cursor = encode_cursor(rows[0], ordering, 'prev')
+        super().__init__(paginator.transform(rows), None, paginator)
+
+    def __repr__(self):
+        return f'<Page {self.cursor}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинация по (pub_date, id): стоимость страницы не зависит
+    от её глубины, COUNT(*) и OFFSET не выполняются.
+    """
+
+    def __init__(self, object_list, per_page, ordering=POST_ORDERING,
+                 transform=list):
+        self.ordering = tuple(ordering)
+        self.transform = transform
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    def get_cursor_page(self, cursor):
+        try:
+            direction, values = decode_cursor(
+                cursor, self.object_list.model, self.ordering
+            )
+        except InvalidCursor:
+            return self.first_page()
+        if direction == 'next':
+            rows = list(
+                self.object_list.filter(
+                    _keyset_filter(self.ordering, values)
+                )[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            return CursorPage(
+                rows[:self.per_page], self, cursor,
+                has_next=has_more, has_previous=True
+            )
+        reverse = _reverse_ordering(self.ordering)
+        rows = list(
+            self.object_list.order_by(*reverse).filter(
+                _keyset_filter(reverse, values)
+            )[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return CursorPage(
+            rows, self, cursor, has_next=True, has_previous=has_more
+        )
+
+    def first_page(self):
+        """
+        Первая страница без COUNT(*): строк читается на одну больше, чтобы
+        узнать, есть ли следующая. Это обычная Page обычного Paginator,
+        как у ?page=1, но номера страниц у неё не показываются.
+        """
+        rows = list(self.object_list[:self.per_page + 1])
+        paginator = Paginator(self.object_list, self.per_page)
+        # count известен только до начала второй страницы: этого хватает
+        # has_next() и не требует запроса.
+        paginator.count = len(rows)
+        page = Page(rows[:self.per_page], 1, paginator)
+        page.cursor = None
+        page.numbered = False
+        page.previous_cursor = None
+        page.next_cursor = None
+        if len(rows) > self.per_page:
+            page.next_cursor = encode_cursor(
+                rows[self.per_page - 1], self.ordering, 'next'
+            )
+        page.newest_cursor = newest_cursor(rows, self.ordering)
+        page.object_list = self.transform(rows[:self.per_page])
+        return page
+
+
+def paginate(request, queryset, per_page=None, ordering=POST_ORDERING,
+             transform=list):
+    """
+    Возвращает страницу ленты.
+
+    Запросы с ?cursor= и первая страница без параметров обслуживаются
+    keyset-пагинацией, COUNT(*) и OFFSET не выполняются. Старые ссылки
+    вида ?page=N продолжают работать через обычный Paginator; ссылка
+    "Следующая" у них тоже ведёт на курсор, поэтому дальнейшее
+    листание не использует OFFSET.
+
+    transform превращает строки страницы в то, что увидит шаблон,
+    например записи ленты в посты. per_page по умолчанию - PER_PAGE.
+    """
+    per_page = per_page or settings.PER_PAGE
+    cursor = request.GET.get('cursor')
+    paginator = CursorPaginator(queryset, per_page, ordering, transform)
+    if cursor:
+        return paginator.get_cursor_page(cursor)
+    if 'page' not in request.GET:
+        return paginator.first_page()
+    paginator = Paginator(queryset.order_by(*ordering), per_page)
+    page = paginator.get_page(request.GET.get('page'))
+    rows = list(page.object_list)
+    page.numbered = True
+    page.next_cursor = None
+    if page.has_next() and rows:
+        page.next_cursor = encode_cursor(rows[-1], ordering, 'next')
+    page.newest_cursor = None
+    if not page.has_previous():
+        page.newest_cursor = newest_cursor(rows, ordering)
+    page.object_list = transform(rows)
+    return page
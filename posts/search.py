@@ -0,0 +1,163 @@
+"""
+Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+Индекс - виртуальная таблица posts_search, одна строка на пост или
+комментарий. rowid строки однозначно задаёт объект: id * 2 для поста
+и id * 2 + 1 для комментария, поэтому обновление и удаление - это
+операции по первичному ключу. Индекс поддерживается сигналами
+и пересобирается командой ./manage.py rebuild_search_index.
+"""
+import re
+from collections import namedtuple
+from itertools import islice
+
+from django.db import connection, transaction
+
+from .models import Comment, Post
+from .paginators import InvalidCursor, pack_cursor, unpack_cursor
+
+TABLE = 'posts_search'
+POST, COMMENT = 'post', 'comment'
+BATCH_SIZE = 1000
+
+CREATE_TABLE = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+    "text, kind UNINDEXED, post_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+DROP_TABLE = f'DROP TABLE IF EXISTS {TABLE}'
+
+Hit = namedtuple('Hit', 'post comment')
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, pk):
+    return pk * 2 + (kind == COMMENT)
+
+
+def _write(rows):
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(islice(rows, BATCH_SIZE))
+            if not batch:
+                return
+            # Без транзакции SQLite фиксирует каждую строку отдельно.
+            with transaction.atomic():
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {TABLE}'
+                    '(rowid, text, kind, post_id) VALUES (%s, %s, %s, %s)',
+                    batch
+                )
+
+
+def index_post(post):
+    index_posts([post])
+
+
+def index_posts(posts):
+    if enabled():
+        _write(
+            (_rowid(POST, post.pk), post.text, POST, post.pk)
+            for post in posts
+        )
+
+
+def index_comment(comment):
+    if enabled():
+        _write([(
+            _rowid(COMMENT, comment.pk), comment.text, COMMENT,
+            comment.post_id
+        )])
+
+
+def unindex(kind, pk):
+    if enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(kind, pk)]
+            )
+
+
+def rebuild():
+    """Пересобирает индекс по всем постам и комментариям."""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_TABLE)
+        cursor.execute(CREATE_TABLE)
+        # Строки копируются внутри SQLite, минуя Python.
+        with transaction.atomic():
+            cursor.execute(
+                f'INSERT INTO {TABLE}(rowid, text, kind, post_id) '
+                f'SELECT id * 2, text, %s, id '
+                f'FROM {qn(Post._meta.db_table)}',
+                [POST]
+            )
+            cursor.execute(
+                f'INSERT INTO {TABLE}(rowid, text, kind, post_id) '
+                f'SELECT id * 2 + 1, text, %s, post_id '
+                f'FROM {qn(Comment._meta.db_table)}',
+                [COMMENT]
+            )
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+
+
+def to_match(query):
+    """
+    Превращает ввод пользователя в выражение MATCH: каждое слово
+    в кавычках, все слова обязательны, последнее ищется по префиксу.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(query, cursor=None, limit=10):
+    """
+    Возвращает (hits, next_cursor): найденные посты и комментарии,
+    отсортированные по релевантности bm25, и курсор следующей страницы.
+    """
+    match = to_match(query)
+    if match is None or not enabled():
+        return [], None
+    sql = (
+        f'SELECT rowid, kind, post_id, rank FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s'
+    )
+    params = [match]
+    if cursor:
+        try:
+            _, (rank, rowid) = unpack_cursor(cursor)
+            params += [float(rank), float(rank), int(rowid)]
+        except (InvalidCursor, TypeError, ValueError):
+            pass
+        else:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+    sql += ' ORDER BY rank, rowid LIMIT %s'
+    params.append(limit + 1)
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        rows = db.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        rowid, _, _, rank = rows[-1]
+        next_cursor = pack_cursor('next', [rank, rowid])
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        {post_id for _, _, post_id, _ in rows}
+    )
+    comments = Comment.objects.select_related('author').in_bulk(
+        [rowid // 2 for rowid, kind, _, _ in rows if kind == COMMENT]
+    )
+    hits = []
+    for rowid, kind, post_id, _ in rows:
+        comment = comments.get(rowid // 2) if kind == COMMENT else None
+        if post_id in posts and (kind == POST or comment is not None):
+            hits.append(Hit(posts[post_id], comment))
+    return hits, next_cursor
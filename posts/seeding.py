@@ -0,0 +1,362 @@
+"""
+Синтетические данные для бенчмарков и нагрузочных тестов.
+
+Строки генерируются потоком и вставляются пачками через executemany,
+в обход ORM и сигналов, поэтому в памяти никогда не лежит вся таблица.
+Денормализованные данные (счётчики, ленты подписок, поисковый индекс)
+после загрузки пересчитываются одним проходом.
+
+Популярность авторов и групп распределена по закону Ципфа: вероятность
+выбрать k-го по популярности пропорциональна 1 / k ** exponent. Число
+подписок пользователя распределено экспоненциально, комментарии чаще
+достаются свежим постам.
+"""
+import random
+from array import array
+from bisect import bisect
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+from PIL import Image
+
+from yatube.sqlite3.base import apply_pragmas
+
+from . import counters, search
+from .db import insert_rows
+from .models import (AuthorStats, Comment, Follow, Group, Post,
+                     TimelineEntry, User)
+
+# Все засеянные посты с картинкой ссылаются на один файл.
+SEED_IMAGE = 'posts/seed.jpg'
+
+# Загрузка без fsync, проверки внешних ключей (генератор ссылается
+# только на существующие строки) и с большим кэшем страниц. Сбой во
+# время загрузки может испортить базу, поэтому только для баз, которые
+# не жалко.
+LOAD_PRAGMAS = {
+    'foreign_keys': 'OFF',
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'cache_size': -262144,
+    'temp_store': 'MEMORY',
+}
+
+WORDS = (
+    'пост', 'лето', 'город', 'горы', 'поход', 'книга', 'кофе', 'утро',
+    'вечер', 'море', 'дождь', 'солнце', 'друзья', 'работа', 'кино',
+    'музыка', 'дорога', 'лес', 'река', 'снег', 'сад', 'кот', 'собака',
+    'поезд', 'пирог', 'чай', 'фото', 'новости', 'идея', 'проект', 'код',
+    'python', 'django', 'выходные', 'отпуск', 'парк', 'мост', 'озеро',
+)
+
+
+class ZipfSampler:
+    """Случайный индекс 0..n-1, k-й по популярности - с весом 1/k**s."""
+
+    def __init__(self, n, exponent, rng, shuffle=True):
+        self.rng = rng
+        self.weights = array('d', accumulate(
+            1 / rank ** exponent for rank in range(1, n + 1)
+        ))
+        self.total = self.weights[-1]
+        # Популярность не должна совпадать с порядком id.
+        self.order = array('q', range(n))
+        if shuffle:
+            rng.shuffle(self.order)
+
+    def __call__(self):
+        rank = bisect(self.weights, self.rng.random() * self.total)
+        return self.order[min(rank, len(self.order) - 1)]
+
+
+class TextSampler:
+    """
+    Случайный текст из low..high слов. Слова берутся отрезком из заранее
+    перемешанного потока: это на порядок быстрее, чем выбирать каждое.
+    """
+
+    def __init__(self, rng, size=1 << 16):
+        self.rng = rng
+        self.words = rng.choices(WORDS, k=size)
+
+    def __call__(self, low, high):
+        random = self.rng.random
+        start = int(random() * (len(self.words) - high))
+        end = start + low + int(random() * (high - low + 1))
+        return ' '.join(self.words[start:end]).capitalize()
+
+
+@contextmanager
+def load_pragmas(pragmas=LOAD_PRAGMAS):
+    """Меняет PRAGMA соединения SQLite на время блока."""
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    connection.ensure_connection()
+    raw = connection.connection
+    previous = {
+        name: raw.execute(f'PRAGMA {name}').fetchone()[0] for name in pragmas
+    }
+    apply_pragmas(raw, pragmas)
+    try:
+        yield
+    finally:
+        apply_pragmas(raw, previous)
+
+
+@contextmanager
+def deferred_indexes(models):
+    """
+    Удаляет вторичные индексы таблиц SQLite на время блока и строит их
+    заново в конце: один проход с сортировкой намного быстрее, чем
+    обновлять индексы на каждой вставленной строке. Индексы UNIQUE
+    ограничений не трогаются.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    tables = [model._meta.db_table for model in models]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT name, sql FROM sqlite_master WHERE type = %s '
+            f'AND sql IS NOT NULL AND tbl_name IN '
+            f'({", ".join(["%s"] * len(tables))})',
+            ['index', *tables]
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+def seed_image():
+    """Создаёт картинку SEED_IMAGE в хранилище, если её ещё нет."""
+    if default_storage.exists(SEED_IMAGE):
+        return
+    image = Image.linear_gradient('L').resize((1280, 720)).convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    default_storage.save(SEED_IMAGE, ContentFile(buffer.getvalue()))
+
+
+def _next_id(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+class Seeder:
+    """
+    Генератор набора данных. Параметры:
+        users, groups, posts      - число строк;
+        follows_per_user          - среднее число подписок;
+        comments_per_post         - среднее число комментариев;
+        follow_exponent           - показатель Ципфа для авторов;
+        group_exponent            - показатель Ципфа для групп;
+        group_share               - доля постов в группах;
+        image_share               - доля постов с картинкой;
+        days                      - за сколько дней разложены посты;
+        timeline_depth            - сколько последних постов каждого
+                                    автора попадает в ленту подписчика;
+        defer_indexes             - строить индексы SQLite после загрузки
+                                    таблицы, а не во время неё.
+    """
+
+    def __init__(self, users=1000, groups=20, posts=10000,
+                 follows_per_user=20, comments_per_post=2,
+                 follow_exponent=1.1, group_exponent=1.2, group_share=0.5,
+                 image_share=0.0, days=365, timeline_depth=20,
+                 defer_indexes=True, batch_size=10000, seed=0):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.follows_per_user = follows_per_user
+        self.comments_per_post = comments_per_post
+        self.follow_exponent = follow_exponent
+        self.group_exponent = group_exponent
+        self.group_share = group_share
+        self.image_share = image_share
+        self.days = days
+        self.timeline_depth = timeline_depth
+        self.defer_indexes = defer_indexes
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.text = TextSampler(self.rng)
+        start = timezone.now() - timedelta(days=days)
+        # Даты считаются в секундах от start и переводятся в наивное
+        # время часового пояса базы без преобразований на каждой строке.
+        self.origin = (
+            timezone.make_naive(start, timezone.utc) if settings.USE_TZ
+            else start
+        )
+        self.span = days * 24 * 60 * 60
+        self.adapt = connection.ops.adapt_datetimefield_value
+
+    def _datetime(self, seconds):
+        return self.adapt(self.origin + timedelta(seconds=seconds))
+
+    def _pub_date(self, index):
+        # Посты равномерно разложены по времени в порядке id.
+        return self.span * index / self.posts
+
+    def user_rows(self):
+        joined = self._datetime(0)
+        for pk in range(self.user_base, self.user_base + self.users):
+            yield (pk, f'user{pk}', '!', '', '', '', False, False, True,
+                   joined)
+
+    def group_rows(self):
+        for pk in range(self.group_base, self.group_base + self.groups):
+            yield (pk, f'Группа {pk}', f'group-{pk}', self.text(3, 10), 1)
+
+    def follow_rows(self):
+        for user in range(self.users):
+            wanted = min(
+                self.users - 1,
+                int(self.rng.expovariate(1 / self.follows_per_user))
+            )
+            authors = set()
+            for _ in range(wanted * 3):
+                if len(authors) >= wanted:
+                    break
+                author = self.authors()
+                if author != user:
+                    authors.add(author)
+            for author in authors:
+                yield (self.user_base + user, self.user_base + author)
+
+    def post_rows(self):
+        random = self.rng.random
+        for index in range(self.posts):
+            group = None
+            if self.groups and random() < self.group_share:
+                group = self.group_base + self.group_sampler()
+            yield (
+                self.post_base + index,
+                self.text(5, 60),
+                self._datetime(self._pub_date(index)),
+                self.user_base + self.authors(),
+                group,
+                SEED_IMAGE if random() < self.image_share else '',
+                0,
+                1,
+            )
+
+    def comment_rows(self):
+        if not self.posts:
+            return
+        random = self.rng.random
+        expovariate = self.rng.expovariate
+        # Свежие посты обсуждают чаще: ранг 0 - самый новый пост.
+        recent = ZipfSampler(self.posts, 0.6, self.rng, shuffle=False)
+        for _ in range(int(self.posts * self.comments_per_post)):
+            index = self.posts - 1 - recent()
+            # В среднем через два часа после поста.
+            created = min(
+                self._pub_date(index) + expovariate(1 / 7200), self.span
+            )
+            yield (
+                self.post_base + index,
+                self.user_base + int(random() * self.users),
+                self.text(2, 20),
+                self._datetime(created),
+            )
+
+    def fill_timelines(self):
+        """
+        Переводит знаменитостей в режим pull и раскладывает посты
+        остальных авторов по лентам подписчиков, как это сделали бы
+        fan_out и backfill.
+        """
+        AuthorStats.objects.filter(
+            user_id__gte=self.user_base,
+            followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+        ).update(pull=True)
+        if not self.timeline_depth:
+            return 0
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            # Сначала последние timeline_depth постов каждого автора,
+            # потом соединение с подписками: иначе нумеровать пришлось
+            # бы все пары (подписка, пост).
+            cursor.execute(
+                f'INSERT INTO {qn(TimelineEntry._meta.db_table)} '
+                '(user_id, post_id, author_id, pub_date) '
+                'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+                f'FROM {qn(Follow._meta.db_table)} f JOIN ('
+                '  SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+                '    PARTITION BY author_id ORDER BY pub_date DESC'
+                '  ) AS n '
+                f'  FROM {qn(Post._meta.db_table)} WHERE id >= %s'
+                '  AND author_id NOT IN ('
+                f'    SELECT user_id FROM {qn(AuthorStats._meta.db_table)}'
+                '    WHERE pull'
+                '  )'
+                ') p ON p.author_id = f.author_id AND p.n <= %s '
+                'WHERE f.id >= %s '
+                # Вставка в порядке индексов ленты намного быстрее.
+                'ORDER BY f.user_id, p.pub_date',
+                [self.post_base, self.timeline_depth, self.follow_base]
+            )
+            return cursor.rowcount
+
+    def _indexes_deferred(self, model):
+        if self.defer_indexes:
+            return deferred_indexes([model])
+        return nullcontext()
+
+    def run(self, log=None):
+        """Загружает данные и возвращает {таблица: число строк}."""
+        log = log or (lambda message: None)
+        self.user_base = _next_id(User)
+        self.group_base = _next_id(Group)
+        self.post_base = _next_id(Post)
+        self.follow_base = _next_id(Follow)
+        self.authors = ZipfSampler(self.users, self.follow_exponent, self.rng)
+        self.group_sampler = ZipfSampler(
+            max(self.groups, 1), self.group_exponent, self.rng
+        )
+        tables = (
+            ('users', User, (
+                'id', 'username', 'password', 'first_name', 'last_name',
+                'email', 'is_superuser', 'is_staff', 'is_active',
+                'date_joined'
+            ), self.user_rows),
+            ('groups', Group, (
+                'id', 'title', 'slug', 'description', 'version'
+            ), self.group_rows),
+            ('follows', Follow, ('user', 'author'), self.follow_rows),
+            ('posts', Post, (
+                'id', 'text', 'pub_date', 'author', 'group', 'image',
+                'comments_count', 'version'
+            ), self.post_rows),
+            ('comments', Comment, ('post', 'author', 'text', 'created'),
+             self.comment_rows),
+        )
+        if self.image_share:
+            seed_image()
+        loaded = {}
+        for name, model, fields, rows in tables:
+            with self._indexes_deferred(model):
+                loaded[name] = insert_rows(
+                    model, fields, rows(), self.batch_size
+                )
+            log(f'{name}: {loaded[name]}')
+        counters.repair()
+        with self._indexes_deferred(TimelineEntry):
+            loaded['timeline'] = self.fill_timelines()
+        log(f'timeline: {loaded["timeline"]}')
+        if search.enabled():
+            search.rebuild()
+        return loaded
@@ -0,0 +1,98 @@
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import caching, counters, follow_graph, search, timeline, trending
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        # Счётчик и версию меняет только БД: иначе сохранение формы
+        # затрёт их значениями, прочитанными до правки.
+        instance.comments_count = F('comments_count')
+        instance.version = F('version') + 1
+        instance._previous_group = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group__slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if created:
+        counters.bump_stats(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    elif not raw:
+        instance.refresh_from_db(fields=('comments_count', 'version'))
+    if not raw:
+        groups = [getattr(instance, '_previous_group', None)]
+        if instance.group_id is not None:
+            groups.append(instance.group.slug)
+        caching.bump_generations(*caching.post_generations(
+            instance.author.username, groups, instance.pk
+        ))
+        search.index_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    caching.invalidate_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_stats(instance.author_id, 'posts_count', -1)
+    search.unindex(search.POST, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+        caching.bump_post_version(instance.post_id)
+        caching.invalidate_post(instance.post_id)
+        trending.record_comment(instance)
+    if not raw:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+    caching.bump_post_version(instance.post_id)
+    caching.invalidate_post(instance.post_id)
+    trending.forget_comment(instance)
+    search.unindex(search.COMMENT, instance.pk)
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, raw=False, **kwargs):
+    if not raw:
+        caching.update_group_version(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_stats(instance.author_id, 'followers_count', 1)
+        counters.bump_stats(instance.user_id, 'following_count', 1)
+        caching.invalidate_users(instance.author_id, instance.user_id)
+        follow_graph.add_follow(instance.user_id, instance.author_id)
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_stats(instance.author_id, 'followers_count', -1)
+    counters.bump_stats(instance.user_id, 'following_count', -1)
+    caching.invalidate_users(instance.author_id, instance.user_id)
+    follow_graph.remove_follow(instance.user_id, instance.author_id)
+    timeline.prune(instance)
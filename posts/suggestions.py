@@ -0,0 +1,160 @@
+"""
+Рекомендации "кого почитать".
+
+Оценка автора c для пользователя u - сколько из тех, на кого подписан
+u, подписаны на c: строка u произведения F @ F, где F - разреженная
+матрица подписок (F[u, a] = 1, если u подписан на a). Уже прочитанные
+авторы и сам пользователь отбрасываются, остаются TOP_K лучших.
+
+Расчёт офлайновый (./manage.py suggest_authors): подписки читаются в
+CSR-матрицу, произведение считается пачками строк. Размер пачки
+выбирается по оценке числа ненулевых элементов её произведения, поэтому
+память ограничена max_work независимо от размера графа. Результат
+пачки заменяет рекомендации её пользователей в одной транзакции, и
+страницы всё время показывают целые списки.
+
+NumPy и SciPy импортируются только здесь: веб-процессам они не нужны,
+и ставятся отдельно, из requirements-offline.txt.
+"""
+from django.db import connection, transaction
+
+from . import caching, follow_graph
+from .db import insert_rows
+from .models import Follow, Suggestion
+
+TOP_K = 10
+GENERATION = 'suggestions'
+FETCH_ROWS = 100000
+
+
+def for_user(user, limit):
+    """Рекомендации пользователя без авторов, на которых он уже подписан."""
+    if not user.is_authenticated:
+        return []
+    suggestions = list(
+        Suggestion.objects.filter(user=user).select_related(
+            'author'
+        ).order_by('-score', 'author_id')[:TOP_K]
+    )
+    followed = follow_graph.followed(
+        user.pk, [suggestion.author_id for suggestion in suggestions]
+    )
+    return [
+        suggestion for suggestion in suggestions
+        if suggestion.author_id not in followed
+    ][:limit]
+
+
+def load_graph():
+    """Матрица подписок в формате CSR, строки и столбцы - id пользователей."""
+    import numpy as np
+    from scipy import sparse
+
+    chunks = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT user_id, author_id FROM {Follow._meta.db_table}'
+        )
+        while True:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int32))
+    edges = (
+        np.concatenate(chunks) if chunks
+        else np.empty((0, 2), dtype=np.int32)
+    )
+    size = int(edges.max()) + 1 if len(edges) else 0
+    graph = sparse.csr_matrix(
+        (np.ones(len(edges), dtype=np.int32), (edges[:, 0], edges[:, 1])),
+        shape=(size, size)
+    )
+    # Повторные подписки сложились - оставляем по единице.
+    graph.data[:] = 1
+    return graph
+
+
+def _batches(graph, max_work):
+    """
+    Границы пачек строк: у пачки сумма по строкам числа подписок их
+    авторов - верхняя граница ненулевых элементов произведения - не
+    больше max_work (кроме пачки из одной строки).
+    """
+    import numpy as np
+
+    work = graph @ np.diff(graph.indptr).astype(np.int64)
+    total = np.cumsum(work)
+    start = 0
+    while start < graph.shape[0]:
+        done = total[start - 1] if start else 0
+        end = int(np.searchsorted(total, done + max_work, side='right'))
+        end = max(end, start + 1)
+        yield start, end
+        start = end
+
+
+def _top(scores, start, top_k):
+    """Лучшие top_k столбцов каждой строки: (user_ids, author_ids, scores)."""
+    import numpy as np
+
+    # Внутри строки - по убыванию оценки, при равенстве - по id автора:
+    # столбцы упорядочены, а сортировка по ключу (строка, -оценка)
+    # устойчивая. Один ключ int64 сортируется в разы быстрее lexsort.
+    scores.sort_indices()
+    rows = np.repeat(
+        np.arange(scores.shape[0], dtype=np.int64), np.diff(scores.indptr)
+    )
+    top = int(scores.data.max()) + 1 if scores.nnz else 1
+    order = np.argsort(rows * top + (top - 1 - scores.data), kind='stable')
+    best = np.arange(len(order)) - scores.indptr[rows] < top_k
+    keep = order[best]
+    return rows[best] + start, scores.indices[keep], scores.data[keep]
+
+
+def suggest(graph, top_k=TOP_K, max_work=5000000):
+    """
+    Считает рекомендации по матрице подписок пачками пользователей.
+    Отдаёт (start, end, user_ids, author_ids, scores) для каждой пачки.
+    """
+    from scipy import sparse
+
+    for start, end in _batches(graph, max_work):
+        batch = graph[start:end]
+        scores = (batch @ graph).tocsr()
+        # Убираем тех, на кого уже подписан, и самого пользователя.
+        own = batch + sparse.eye(
+            end - start, graph.shape[1], k=start, dtype=batch.dtype,
+            format='csr'
+        )
+        scores = scores - scores.multiply(own > 0)
+        scores.eliminate_zeros()
+        yield (start, end) + _top(scores, start, top_k)
+
+
+def rebuild(top_k=TOP_K, max_work=5000000, log=None):
+    """
+    Пересчитывает таблицу Suggestion. Возвращает число рекомендаций.
+    """
+    graph = load_graph()
+    if log:
+        log(f'подписок {graph.nnz}, пользователей {graph.shape[0]}')
+    total = 0
+    for start, end, users, authors, scores in suggest(
+        graph, top_k, max_work
+    ):
+        with transaction.atomic():
+            Suggestion.objects.filter(
+                user_id__gte=start, user_id__lt=end
+            ).delete()
+            total += insert_rows(
+                Suggestion, ('user', 'author', 'score'),
+                zip(users.tolist(), authors.tolist(), scores.tolist()),
+                len(users) or 1
+            )
+        if log:
+            log(f'пользователи до {end}: рекомендаций {total}')
+    # Пользователи с id за последней строкой матрицы ни на кого не
+    # подписаны, их старые рекомендации тоже устарели.
+    Suggestion.objects.filter(user_id__gte=graph.shape[0]).delete()
+    caching.bump_generations(GENERATION)
+    return total
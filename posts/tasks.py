@@ -0,0 +1,245 @@
+"""
+Фоновые задачи без внешнего брокера.
+
+defer(func, *args, **kwargs) записывает вызов в таблицу Task и сразу
+возвращается. Строка добавляется в текущую транзакцию, поэтому задача
+появится, только если зафиксированы и данные, ради которых её заказали.
+./manage.py run_tasks берёт готовые задачи - сначала с большим
+приоритетом, при равном - самые давние - и выполняет их в пуле процессов.
+
+Задача берётся одним UPDATE: run_after переносится на
+TASK_VISIBILITY_TIMEOUT вперёд, в lease записывается метка обработчика.
+Условие run_after <= now повторяется во внешнем запросе, и строку,
+которую только что взял другой обработчик, UPDATE пропускает. Если
+обработчик упал, не закончив задачу, после тайм-аута её возьмёт другой,
+поэтому задачи должны быть идемпотентными. Взятие тоже считается
+попыткой: задачу, которая роняет обработчик max_attempts раз подряд,
+claim помечает failed, а не выдаёт снова. Выполненная задача
+удаляется, ошибка откладывает повтор на TASK_RETRY_DELAY * 2 ** (n - 1)
+секунд. После max_attempts неудач задача остаётся в таблице с
+failed=True и текстом последней ошибки. Задача с ключом key не
+ставится, пока в очереди ждёт или выполняется другая с тем же ключом.
+
+Модуль загружается в рабочих процессах пула до django.setup(), поэтому
+модели импортируются внутри функций.
+"""
+import json
+import multiprocessing
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+def _init_worker():
+    django.setup()
+
+
+def create_pool(workers=None):
+    """Пул процессов с настроенным Django для фоновой работы."""
+    # spawn, а не fork: процесс веб-сервера держит потоки и соединения
+    # с БД, которые нельзя копировать в дочерний процесс.
+    return ProcessPoolExecutor(
+        max_workers=workers or settings.TASK_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker
+    )
+
+
+def _name(func):
+    """Путь к функции, по которому её импортирует рабочий процесс."""
+    if isinstance(func, str):
+        name = func
+    else:
+        name = f'{func.__module__}.{func.__qualname__}'
+    try:
+        found = import_string(name)
+    except ImportError:
+        found = None
+    if not callable(found) or not (isinstance(func, str) or found is func):
+        raise ValueError(
+            f'{name}: откладывать можно только функции уровня модуля'
+        )
+    return name
+
+
+def defer(func, *args, priority=0, delay=0, max_attempts=None, key='',
+          **kwargs):
+    """
+    Откладывает вызов func(*args, **kwargs) и возвращает строку Task.
+    func - функция уровня модуля или путь к ней, аргументы должны
+    сохраняться в JSON. Задачи с большим priority выполняются раньше,
+    delay - не раньше чем через столько секунд. Если задача с тем же
+    key уже ждёт или выполняется, новая не ставится и возвращается
+    прежняя (None, если она успела завершиться).
+    """
+    from .models import Task
+
+    task = Task(
+        name=_name(func),
+        args=json.dumps([args, kwargs]),
+        priority=priority,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+        key=key
+    )
+    try:
+        with transaction.atomic():
+            task.save()
+    except IntegrityError:
+        if not key:
+            raise
+        return Task.objects.filter(key=key, failed=False).first()
+    return task
+
+
+def claim(limit, visibility=None):
+    """Берёт до limit готовых задач и возвращает их."""
+    from .models import Task
+
+    now = timezone.now()
+    lease = uuid.uuid4().hex
+    ready = Task.objects.filter(failed=False, run_after__lte=now)
+    # Последняя попытка не вернулась за тайм-аут: обработчик убит.
+    ready.filter(attempts__gte=F('max_attempts')).update(
+        failed=True,
+        error='Обработчик не завершил последнюю попытку за '
+              'тайм-аут видимости.',
+        lease=''
+    )
+    ready.filter(
+        pk__in=ready.order_by('-priority', 'run_after', 'pk').values(
+            'pk'
+        )[:limit]
+    ).update(
+        run_after=now + timedelta(
+            seconds=visibility or settings.TASK_VISIBILITY_TIMEOUT
+        ),
+        attempts=F('attempts') + 1,
+        lease=lease
+    )
+    return list(
+        Task.objects.filter(lease=lease).order_by('-priority', 'run_after')
+    )
+
+
+def execute(name, args):
+    """Выполняет задачу; вызывается в рабочем процессе."""
+    args, kwargs = json.loads(args)
+    return import_string(name)(*args, **kwargs)
+
+
+def finish(task, error=None):
+    """
+    Удаляет выполненную задачу или откладывает повтор. Задачу, которую
+    после тайм-аута взял другой обработчик, не трогает.
+    """
+    from .models import Task
+
+    mine = Task.objects.filter(pk=task.pk, lease=task.lease)
+    if error is None:
+        mine.delete()
+        return
+    delay = settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+    mine.update(
+        failed=task.attempts >= task.max_attempts,
+        error=''.join(
+            traceback.format_exception(type(error), error, error.__traceback__)
+        ),
+        run_after=timezone.now() + timedelta(seconds=delay),
+        lease=''
+    )
+
+
+class Worker:
+    """
+    Выполняет задачи в пуле из workers процессов, с workers=0 - в
+    текущем процессе, по одной.
+    """
+
+    def __init__(self, workers=None, visibility=None, poll=None, log=None):
+        self.workers = settings.TASK_WORKERS if workers is None else workers
+        self.visibility = visibility or settings.TASK_VISIBILITY_TIMEOUT
+        self.poll = settings.TASK_POLL_INTERVAL if poll is None else poll
+        self.log = log or (lambda message: None)
+        self.stopping = False
+        self.done = self.errors = 0
+
+    def stop(self):
+        """Перестаёт брать задачи; взятые будут доделаны."""
+        self.stopping = True
+
+    def _finish(self, task, error):
+        finish(task, error)
+        if error is None:
+            self.done += 1
+            return
+        self.errors += 1
+        self.log(
+            f'{task.name} #{task.pk}, попытка {task.attempts} из '
+            f'{task.max_attempts}: {error!r}'
+        )
+
+    def _run_inline(self, once):
+        while not self.stopping:
+            tasks = claim(1, self.visibility)
+            if not tasks:
+                if once:
+                    break
+                time.sleep(self.poll)
+                continue
+            task, error = tasks[0], None
+            try:
+                execute(task.name, task.args)
+            except Exception as exc:
+                error = exc
+            self._finish(task, error)
+
+    def run(self, once=False):
+        """
+        Выполняет задачи до вызова stop(), с once=True - пока есть
+        готовые. Возвращает (выполнено, ошибок).
+        """
+        if not self.workers:
+            self._run_inline(once)
+            return self.done, self.errors
+        pool = create_pool(self.workers)
+        running = {}
+        try:
+            while True:
+                free = self.workers - len(running)
+                if free and not self.stopping:
+                    for task in claim(free, self.visibility):
+                        future = pool.submit(execute, task.name, task.args)
+                        running[future] = task
+                if not running:
+                    if once or self.stopping:
+                        break
+                    time.sleep(self.poll)
+                    continue
+                finished, _ = wait(
+                    running, timeout=self.poll, return_when=FIRST_COMPLETED
+                )
+                if any(
+                    isinstance(future.exception(), BrokenProcessPool)
+                    for future in finished
+                ):
+                    # Рабочий процесс умер: все задачи пула завершились
+                    # с ошибкой, а сам пул больше не принимает новые.
+                    finished, _ = wait(running)
+                    pool.shutdown(wait=False)
+                    pool = create_pool(self.workers)
+                for future in finished:
+                    self._finish(running.pop(future), future.exception())
+        finally:
+            pool.shutdown()
+        return self.done, self.errors
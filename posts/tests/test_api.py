@@ -0,0 +1,175 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=self.author,
+                group=self.group if number % 2 else None
+            )
+            for number in range(5)
+        ]
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, client, url, data=None):
+        response = client.get(url, data)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'],
+                         'application/json; charset=utf-8')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_index_pages_with_cursor(self):
+        ids = []
+        data = {'limit': 2}
+        while True:
+            page = self.get_json(self.client, reverse('api:index'), data)
+            ids += [post['id'] for post in page['results']]
+            if page['next'] is None:
+                break
+            data['cursor'] = page['next']
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+
+    def test_sparse_fields(self):
+        page = self.get_json(
+            self.client, reverse('api:index'), {'fields': 'id,author'}
+        )
+        self.assertEqual(
+            page['results'][0], {'id': self.posts[-1].id, 'author': 'author'}
+        )
+
+    def test_group_and_profile(self):
+        group = self.get_json(
+            self.client, reverse('api:group', args=[self.group.slug])
+        )
+        self.assertEqual(
+            {post['group'] for post in group['results']}, {'group'}
+        )
+        self.assertEqual(len(group['results']), 2)
+        profile = self.get_json(
+            self.client, reverse('api:profile', args=['author'])
+        )
+        self.assertEqual(len(profile['results']), 5)
+
+    def test_follow_feed(self):
+        url = reverse('api:follow_index')
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.UNAUTHORIZED
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        page = self.get_json(self.reader_client, url, {'limit': 3})
+        self.assertEqual(
+            [post['id'] for post in page['results']],
+            [post.id for post in reversed(self.posts)][:3]
+        )
+        page = self.get_json(self.reader_client, url, {
+            'limit': 3, 'cursor': page['next']
+        })
+        self.assertEqual(
+            [post['id'] for post in page['results']],
+            [post.id for post in reversed(self.posts)][3:]
+        )
+        self.assertIsNone(page['next'])
+
+    def test_new_posts(self):
+        cache.clear()
+        page = self.get_json(self.client, reverse('api:index'), {'limit': 2})
+        url = reverse('api:index_new')
+        self.assertEqual(
+            self.client.get(url, {'since': page['newest']}).json(),
+            {'count': 0, 'more': False, 'ids': []}
+        )
+        first = Post.objects.create(text='Новый', author=self.author)
+        second = Post.objects.create(text='Новее', author=self.author)
+        # Ответ ещё в кэше.
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.client.get(url, {'since': page['newest']}).json()[
+                    'count'
+                ],
+                0
+            )
+        cache.clear()
+        self.assertEqual(
+            self.client.get(url, {'since': page['newest']}).json(),
+            {'count': 2, 'more': False, 'ids': [second.id, first.id]}
+        )
+        self.assertContains(
+            self.client.get(reverse('index')), f'{url}?since='
+        )
+
+    def test_new_posts_in_follow_feed(self):
+        cache.clear()
+        celebrity = User.objects.create_user(username='celebrity')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=celebrity)
+        AuthorStats.objects.filter(user=celebrity).update(pull=True)
+        page = self.get_json(
+            self.reader_client, reverse('api:follow_index'), {'limit': 1}
+        )
+        fanned_out = Post.objects.create(text='Новый', author=self.author)
+        pulled = Post.objects.create(text='Громкий', author=celebrity)
+        self.assertEqual(
+            self.reader_client.get(
+                reverse('api:follow_new'), {'since': page['newest']}
+            ).json()['ids'],
+            [pulled.id, fanned_out.id]
+        )
+
+    def test_post_with_comments(self):
+        post = self.posts[0]
+        for number in range(3):
+            Comment.objects.create(
+                post=post, author=self.reader, text=f'Комментарий {number}'
+            )
+        data = self.get_json(
+            self.client, reverse('api:post', args=[post.id])
+        )
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['comments_count'], 3)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий 2', 'Комментарий 1', 'Комментарий 0']
+        )
+        data = self.get_json(
+            self.client, reverse('api:post', args=[post.id]),
+            {'fields': 'comments'}
+        )
+        self.assertEqual(list(data), ['comments'])
+
+    def test_errors(self):
+        for url, data, status in (
+            (reverse('api:index'), {'fields': 'password'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:index'), {'cursor': 'broken'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:index'), {'limit': 'many'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:index_new'), {'since': 'broken'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:follow_new'), None, HTTPStatus.UNAUTHORIZED),
+            (reverse('api:post', args=[0]), None, HTTPStatus.NOT_FOUND),
+            (reverse('api:group', args=['missing']), None,
+             HTTPStatus.NOT_FOUND),
+        ):
+            with self.subTest(url=url, data=data):
+                response = self.client.get(url, data)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', json.loads(response.content))
@@ -0,0 +1,102 @@
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import export
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.posts = [
+            Post.objects.create(text=f'Пост {number}', author=self.author)
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def read_ndjson(self, name):
+        with gzip.open(f'{self.directory}/{name}.ndjson.gz', 'rt') as dump:
+            return [json.loads(line) for line in dump]
+
+    def test_ndjson_and_csv(self):
+        call_command('export', self.directory, stdout=io.StringIO())
+        posts = self.read_ndjson('posts')
+        self.assertEqual(
+            [post['id'] for post in posts], [post.id for post in self.posts]
+        )
+        self.assertEqual(posts[0]['text'], 'Пост 0')
+        self.assertEqual(len(self.read_ndjson('comments')), 1)
+        self.assertEqual(self.read_ndjson('follows'), [{
+            'id': Follow.objects.get().id,
+            'user_id': self.reader.id,
+            'author_id': self.author.id,
+        }])
+        call_command(
+            'export', self.directory, format='csv', tables='comments',
+            stdout=io.StringIO()
+        )
+        with gzip.open(f'{self.directory}/comments.csv.gz', 'rt') as dump:
+            rows = list(csv.reader(dump))
+        self.assertEqual(rows[0], list(export.TABLES['comments'][1]))
+        self.assertEqual(rows[1][3], 'Комментарий')
+
+    def test_since(self):
+        old = timezone.now() - timedelta(days=10)
+        Post.objects.filter(pk__in=[post.pk for post in self.posts[:3]]) \
+            .update(pub_date=old)
+        call_command(
+            'export', self.directory, tables='posts',
+            since=(old + timedelta(days=1)).date().isoformat(),
+            stdout=io.StringIO()
+        )
+        self.assertEqual(
+            [post['id'] for post in self.read_ndjson('posts')],
+            [post.id for post in self.posts[3:]]
+        )
+
+    def test_resume_after_interruption(self):
+        append = export._append
+        calls = []
+
+        def failing_append(path, data):
+            calls.append(path)
+            if len(calls) == 2:
+                # Пачка записана наполовину, состояние не сохранено.
+                with open(path, 'ab') as output:
+                    output.write(b'\x1f\x8b broken')
+                raise OSError('диск отключился')
+            return append(path, data)
+
+        exporter = export.Exporter(self.directory, chunk_size=2)
+        with mock.patch('posts.export._append', failing_append):
+            with self.assertRaises(OSError):
+                exporter.export('posts')
+        exported = export.Exporter(
+            self.directory, chunk_size=2, resume=True
+        ).export('posts')
+        self.assertEqual(exported, 3)
+        self.assertEqual(
+            [post['id'] for post in self.read_ndjson('posts')],
+            [post.id for post in self.posts]
+        )
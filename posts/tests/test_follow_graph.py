@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follow_graph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(5)
+        ]
+        for author in self.authors[3::-2]:
+            Follow.objects.create(user=self.reader, author=author)
+
+    def test_membership(self):
+        followed = [self.authors[1].pk, self.authors[3].pk]
+        self.assertEqual(
+            list(follow_graph.following(self.reader.pk)), followed
+        )
+        # Второй раз массив читается из кэша.
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.follows(self.reader.pk, self.authors[1].pk)
+            )
+            self.assertFalse(
+                follow_graph.follows(self.reader.pk, self.authors[0].pk)
+            )
+            self.assertEqual(
+                follow_graph.followed(
+                    self.reader.pk, [author.pk for author in self.authors]
+                ),
+                set(followed)
+            )
+        self.assertFalse(follow_graph.follows(None, self.authors[1].pk))
+
+    def test_following_many_loads_misses_in_one_query(self):
+        follow_graph.following(self.reader.pk)
+        with self.assertNumQueries(1):
+            graph = follow_graph.following_many(
+                [self.reader.pk] + [author.pk for author in self.authors]
+            )
+        self.assertEqual(len(graph[self.reader.pk]), 2)
+        self.assertEqual(len(graph[self.authors[0].pk]), 0)
+
+    def test_signals_update_cached_arrays(self):
+        follow_graph.following(self.reader.pk)
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        Follow.objects.filter(
+            user=self.reader, author=self.authors[3]
+        ).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(follow_graph.following(self.reader.pk)),
+                [self.authors[0].pk, self.authors[1].pk]
+            )
+
+    def test_rebuild_command(self):
+        follow_graph.following(self.reader.pk)
+        # Правка в обход сигналов - граф в кэше разошёлся с таблицей.
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.authors[4])]
+        )
+        self.assertFalse(
+            follow_graph.follows(self.reader.pk, self.authors[4].pk)
+        )
+        output = StringIO()
+        call_command('rebuild_follow_graph', stdout=output)
+        self.assertIn('пользователей 1', output.getvalue())
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                follow_graph.follows(self.reader.pk, self.authors[4].pk)
+            )
+
+    def test_profile_does_not_query_follows(self):
+        self.client.force_login(self.reader)
+        url = reverse('profile', args=[self.authors[1].username])
+        self.assertTrue(self.client.get(url).context['following'])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(
+            [query for query in queries if 'posts_follow' in query['sql']]
+        )
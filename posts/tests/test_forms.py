@@ -1,12 +1,14 @@
 import shutil
 import tempfile
 import os
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
 from posts.models import Comment, Group, Post
@@ -203,3 +205,54 @@ class PostFormTests(TestCase):
                 text=form_data['text']
             ).exists()
         )
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR),
+    IMAGE_MAX_SIDE=200
+)
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='testuser')
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    @staticmethod
+    def get_photo(size, orientation):
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        exif[0x010f] = 'Camera maker'
+        content = BytesIO()
+        Image.new('RGB', size, color=(0, 128, 0)).save(
+            content, 'JPEG', exif=exif.tobytes()
+        )
+        return SimpleUploadedFile(
+            'photo.jpg', content.getvalue(), content_type='image/jpeg'
+        )
+
+    def test_upload_is_normalized(self):
+        """Загрузка повёрнута по EXIF, уменьшена и без метаданных."""
+        form = PostForm(
+            data={'text': 'Фото'},
+            files={'image': self.get_photo((600, 300), 6)}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save(commit=False)
+        post.author = self.author
+        post.save()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (100, 200))
+            self.assertEqual(dict(image.getexif()), {})
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_large_image_rejected(self):
+        """Слишком большое изображение отклоняется до декодирования."""
+        form = PostForm(
+            data={'text': 'Фото'},
+            files={'image': self.get_photo((20, 10), 1)}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
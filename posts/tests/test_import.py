@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts import search
+from posts.counters import get_stats
+from posts.importer import Importer
+from posts.models import AuthorStats, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class ImportTest(TestCase):
+    def setUp(self):
+        self.images = tempfile.mkdtemp()
+        Image.new('RGB', (300, 200), 'red').save(
+            os.path.join(self.images, 'red.jpg')
+        )
+        with open(os.path.join(self.images, 'broken.jpg'), 'wb') as broken:
+            broken.write(b'not an image')
+        self.author = User.objects.create_user(username='leo')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Кошки', slug='cats', description='Про кошек'
+        )
+        self.lines = [
+            json.dumps(record, ensure_ascii=False) for record in (
+                {'id': 1, 'author': 'leo', 'text': 'Первый пост',
+                 'pub_date': '2020-01-02T03:04:05+00:00', 'group': 'cats',
+                 'image': 'red.jpg'},
+                {'id': 2, 'author': 'leo', 'text': 'Без картинки'},
+                {'id': 3, 'author': 'nobody', 'text': 'Чужой пост'},
+                {'id': 4, 'author': 'leo', 'text': 'Битая',
+                 'image': 'broken.jpg'},
+                {'id': 5, 'author': 'leo', 'text': 'Вне каталога',
+                 'image': '../secret.jpg'},
+                {'id': 1, 'author': 'leo', 'text': 'Повтор в файле'},
+            )
+        ] + ['{not json', '']
+
+    def tearDown(self):
+        shutil.rmtree(self.images, ignore_errors=True)
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def run_import(self, **options):
+        return Importer(
+            images=self.images, workers=0, batch_size=3, **options
+        ).run(self.lines)
+
+    def test_import(self):
+        stats = self.run_import()
+        self.assertEqual(stats['read'], 7)
+        self.assertEqual(stats['imported'], 2)
+        self.assertEqual(stats['images'], 1)
+        self.assertEqual(stats['failed'], 4)
+        first = Post.objects.get(external_id='1')
+        self.assertEqual(
+            first.pub_date, datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        )
+        self.assertEqual(first.group, self.group)
+        self.assertTrue(first.image.name.startswith('posts/'))
+        with Image.open(first.image.path) as image:
+            self.assertEqual(image.size, (300, 200))
+        # Сигналы не срабатывали, но всё, что они делают, сделано.
+        author = User.objects.get(pk=self.author.pk)
+        self.assertEqual(get_stats(author).posts_count, 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        if search.enabled():
+            hits, _ = search.search('первый')
+            self.assertEqual([hit.post for hit in hits], [first])
+
+    def test_rerun_is_idempotent(self):
+        self.run_import()
+        posts = set(Post.objects.values_list('id', 'image'))
+        stats = self.run_import()
+        self.assertEqual(stats['imported'], 0)
+        self.assertEqual(stats['skipped'], 3)
+        self.assertEqual(set(Post.objects.values_list('id', 'image')), posts)
+        self.assertEqual(len(os.listdir(f'{settings.MEDIA_ROOT}/posts')), 1)
+
+    def test_create_missing(self):
+        self.lines = [json.dumps(
+            {'id': 'a', 'author': 'newbie', 'text': 'Привет',
+             'group': 'dogs'}
+        )]
+        stats = self.run_import(create_missing=True)
+        self.assertEqual(stats['imported'], 1)
+        post = Post.objects.get(external_id='a')
+        self.assertEqual(post.author.username, 'newbie')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'dogs')
+        self.assertEqual(
+            AuthorStats.objects.get(user=post.author).posts_count, 1
+        )
+
+    def test_rejected_rows_leave_no_files(self):
+        self.lines = [json.dumps(
+            {'id': 'a', 'author': 'nobody', 'text': 'Чужой пост',
+             'image': 'red.jpg'}
+        )]
+        stats = self.run_import()
+        self.assertEqual(stats['failed'], 1)
+        self.assertFalse(os.path.exists(f'{settings.MEDIA_ROOT}/posts'))
+
+    def test_command_with_pool(self):
+        path = os.path.join(self.images, 'posts.ndjson')
+        with open(path, 'w') as source:
+            source.write('\n'.join(self.lines[:2]))
+        output = StringIO()
+        call_command(
+            'import_posts', path, images=self.images, workers=1,
+            stdout=output, stderr=StringIO()
+        )
+        self.assertIn('импортировано 2', output.getvalue())
+        self.assertTrue(Post.objects.get(external_id='1').image)
@@ -0,0 +1,69 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from yatube.metrics import histograms
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        histograms.views.clear()
+
+    def test_server_timing_header(self):
+        """Ответ сотруднику содержит время БД, шаблонов и общее время."""
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        response = self.client.get(reverse('index'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, '
+            r'total;dur=[\d.]+$'
+        )
+        queries = int(re.search(r'(\d+) queries', response['Server-Timing'])
+                      .group(1))
+        self.assertGreater(queries, 0)
+
+    def test_server_timing_hidden_from_visitors(self):
+        """Посетители без DEBUG заголовок Server-Timing не получают."""
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(histograms.views['index']['count'], 1)
+
+    def test_streaming_response_measured_after_body(self):
+        """Запросы, сделанные при отдаче потока, попадают в замер."""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=author)
+        response = self.client.get(reverse('api:index'))
+        self.assertNotIn('api:index', histograms.views)
+        b''.join(response.streaming_content)
+        response.close()
+        stats = histograms.views['api:index']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreater(stats['db_queries'], 0)
+
+    def test_metrics_endpoint(self):
+        """Страница метрик отдаёт гистограммы по view."""
+        for _ in range(3):
+            self.client.get(reverse('index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('yatube_request_seconds_count{view="index"} 3', text)
+        self.assertIn(
+            'yatube_request_seconds_bucket{view="index",le="+Inf"} 3', text
+        )
+        self.assertIn('yatube_db_queries_total{view="index"}', text)
+
+    def test_metrics_forbidden_outside_allowed_ips(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, 403)
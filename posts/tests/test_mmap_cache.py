@@ -0,0 +1,100 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from yatube.mmap_cache import MmapCache
+
+
+def _increment(location, times):
+    cache = MmapCache(location, {'OPTIONS': {'MAX_ENTRIES': 64}})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class MmapCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache'
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        options.setdefault('MAX_ENTRIES', 64)
+        return MmapCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        """Базовые операции кэша."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'other'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('new'))
+
+    def test_shared_between_instances(self):
+        """Второй экземпляр видит данные первого через файл."""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+
+    def test_timeout(self):
+        """Просроченное значение не отдаётся."""
+        self.cache.set('key', 'value', timeout=0.05)
+        self.cache.set('forever', 'value', timeout=None)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_oversized_value_is_not_stored(self):
+        """Значение больше слота не сохраняется и сбрасывает старое."""
+        cache = self.make_cache(SLOT_SIZE=256)
+        cache.set('key', 'small')
+        cache.set('key', 'x' * 1024)
+        self.assertIsNone(cache.get('key'))
+
+    def test_lru_eviction(self):
+        """При переполнении набора вытесняется давно не читанный ключ."""
+        cache = self.make_cache(MAX_ENTRIES=2, WAYS=2)
+        cache.set('first', 1)
+        cache.set('second', 2)
+        cache.get('first')
+        cache.set('third', 3)
+        self.assertEqual(cache.get('first'), 1)
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.get('third'), 3)
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из нескольких процессов не теряет обновлений."""
+        self.cache.set('counter', 0)
+        workers = [
+            multiprocessing.Process(
+                target=_increment, args=(self.location, 200)
+            )
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 800)
+        self.assertEqual(self.cache.decr('counter', 800), 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_foreign_file_is_not_truncated(self):
+        """Файл с другой разметкой не переделывается на месте."""
+        location = f'{self.directory}/foreign'
+        with open(location, 'wb') as file:
+            file.write(b'x' * 1024)
+        cache = MmapCache(location, {'OPTIONS': {'MAX_ENTRIES': 64}})
+        with self.assertRaises(ImproperlyConfigured):
+            cache.get('key')
+        with open(location, 'rb') as file:
+            self.assertEqual(file.read(), b'x' * 1024)
@@ -0,0 +1,59 @@
+from contextvars import copy_context
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from posts.models import Post
+from yatube.routers import (PIN_COOKIE, ReplicaMiddleware, ReplicaRouter,
+                            use_primary)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.databases_used = []
+
+    def run_request(self, request, write=False):
+        """Прогоняет запрос через middleware в отдельном контексте."""
+        def view(request):
+            self.databases_used.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+                self.databases_used.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        return copy_context().run(ReplicaMiddleware(view), request)
+
+    def test_reads_go_to_replica(self):
+        response = self.run_request(self.factory.get('/'))
+        self.assertEqual(self.databases_used, ['replica'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_read_your_writes(self):
+        """После записи чтения идут в основную базу, и в этом запросе,
+        и в следующих запросах того же посетителя."""
+        response = self.run_request(self.factory.get('/'), write=True)
+        self.assertEqual(self.databases_used, ['replica', 'default'])
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.run_request(request)
+        self.assertEqual(self.databases_used[-1], 'default')
+
+    def test_mutations_use_primary(self):
+        self.run_request(self.factory.post('/'))
+        self.assertEqual(self.databases_used, ['default'])
+        view = use_primary(
+            lambda request: self.router.db_for_read(Post)
+        )
+        self.assertEqual(
+            copy_context().run(view, self.factory.get('/')), 'default'
+        )
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        response = self.run_request(self.factory.get('/'), write=True)
+        self.assertEqual(self.databases_used, ['default', 'default'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
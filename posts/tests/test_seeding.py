@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.test import TestCase, override_settings
+
+from posts.models import (AuthorStats, Comment, Follow, Post, TimelineEntry,
+                          User)
+from posts.seeding import SEED_IMAGE, Seeder, load_pragmas
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class SeederTest(TestCase):
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def test_seeded_data_is_consistent(self):
+        loaded = Seeder(
+            users=50, groups=5, posts=300, follows_per_user=5,
+            image_share=0.2, timeline_depth=3, batch_size=70
+        ).run()
+        self.assertEqual(loaded['users'], User.objects.count())
+        self.assertEqual(loaded['posts'], Post.objects.count())
+        self.assertEqual(loaded['comments'], Comment.objects.count())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        # Посты с картинкой ссылаются на созданный файл.
+        self.assertTrue(default_storage.exists(SEED_IMAGE))
+        self.assertTrue(Post.objects.filter(image=SEED_IMAGE).exists())
+        # Счётчики пересчитаны после загрузки в обход сигналов.
+        self.assertEqual(
+            AuthorStats.objects.aggregate(total=Sum('posts_count'))['total'],
+            300
+        )
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comments_count'))['total'],
+            loaded['comments']
+        )
+        # В ленте - только подписки и не больше timeline_depth постов
+        # каждого автора.
+        self.assertEqual(loaded['timeline'], TimelineEntry.objects.count())
+        self.assertGreater(loaded['timeline'], 0)
+        follows = set(Follow.objects.values_list('user', 'author'))
+        self.assertLessEqual(
+            set(TimelineEntry.objects.values_list('user', 'author')), follows
+        )
+        self.assertLessEqual(
+            TimelineEntry.objects.values('user', 'author').annotate(
+                total=Count('id')
+            ).order_by('-total')[0]['total'],
+            3
+        )
+
+    def test_same_seed_same_data(self):
+        texts = []
+        for _ in range(2):
+            Seeder(users=10, groups=2, posts=20, timeline_depth=0).run()
+            texts.append(list(
+                Post.objects.order_by('-id').values_list('text', flat=True)
+            )[:20])
+        self.assertEqual(texts[0], texts[1])
+
+    def test_load_pragmas_are_restored(self):
+        def cache_size():
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size')
+                return cursor.fetchone()[0]
+
+        before = cache_size()
+        with load_pragmas({'cache_size': -4096}):
+            self.assertEqual(cache_size(), -4096)
+        self.assertEqual(cache_size(), before)
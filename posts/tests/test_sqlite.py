@@ -0,0 +1,56 @@
+import shutil
+import sqlite3
+import tempfile
+
+from django.test import SimpleTestCase
+
+from yatube.settings_production import DATABASES
+from yatube.sqlite3.base import DatabaseWrapper
+
+
+class ProductionSqliteTest(SimpleTestCase):
+    # Тесты открывают своё соединение с временной базой, но pytest-django
+    # разрешает соединения только тестам, объявившим базы данных.
+    databases = {'default'}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings_dict = dict(
+            DATABASES['default'],
+            NAME=f'{self.directory}/db.sqlite3',
+            TIME_ZONE=None,
+            AUTOCOMMIT=True,
+            ATOMIC_REQUESTS=False,
+        )
+        self.connection = DatabaseWrapper(settings_dict, alias='production')
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connection(self):
+        """Каждое новое соединение получает PRAGMA из OPTIONS."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+    def test_transaction_takes_write_lock_immediately(self):
+        """Транзакция начинается с BEGIN IMMEDIATE."""
+        self.pragma('journal_mode')
+        self.connection._start_transaction_under_autocommit()
+        other = sqlite3.connect(
+            self.connection.settings_dict['NAME'], timeout=0,
+            isolation_level=None
+        )
+        try:
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+                other.execute('BEGIN IMMEDIATE')
+        finally:
+            other.close()
+            self.connection.connection.rollback()
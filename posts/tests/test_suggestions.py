@@ -0,0 +1,99 @@
+from importlib.util import find_spec
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Suggestion
+
+User = get_user_model()
+
+
+class SuggestionsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'leo', 'kate', 'max', 'ann')
+        }
+        for user, author in (
+            ('reader', 'leo'), ('reader', 'kate'),
+            ('leo', 'max'), ('kate', 'max'), ('kate', 'ann'),
+            ('kate', 'reader'), ('max', 'ann'),
+        ):
+            Follow.objects.create(
+                user=self.users[user], author=self.users[author]
+            )
+        self.client.force_login(self.users['reader'])
+
+    def suggested(self, name):
+        return list(
+            Suggestion.objects.filter(user=self.users[name]).order_by(
+                '-score', 'author__username'
+            ).values_list('author__username', 'score')
+        )
+
+    @skipUnless(
+        find_spec('numpy') and find_spec('scipy'), 'нужны NumPy и SciPy'
+    )
+    def test_command(self):
+        self.users['stale'] = User.objects.create_user(username='stale')
+        Suggestion.objects.create(
+            user=self.users['stale'], author=self.users['leo'], score=1
+        )
+        output = StringIO()
+        call_command('suggest_authors', max_work=1, stdout=output)
+        self.assertIn('Рекомендаций 4', output.getvalue())
+        # Себя и тех, на кого уже подписан, не советуем.
+        self.assertEqual(self.suggested('reader'), [('max', 2), ('ann', 1)])
+        self.assertEqual(self.suggested('kate'), [('leo', 1)])
+        self.assertEqual(self.suggested('leo'), [('ann', 1)])
+        self.assertEqual(self.suggested('max'), [])
+        self.assertEqual(self.suggested('stale'), [])
+
+    def test_pages_show_suggestions(self):
+        for author, score in (('max', 2), ('ann', 1), ('leo', 1)):
+            Suggestion.objects.create(
+                user=self.users['reader'], author=self.users[author],
+                score=score
+            )
+        for url in (
+            reverse('profile', args=['leo']), reverse('follow_index')
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                # leo уже в подписках - его рекомендация устарела.
+                self.assertEqual(
+                    [
+                        suggestion.author.username
+                        for suggestion in response.context['suggestions']
+                    ],
+                    ['max', 'ann']
+                )
+                self.assertContains(
+                    response, reverse('profile_follow', args=['max'])
+                )
+        response = self.client.get(reverse('profile', args=['leo']))
+        Follow.objects.create(
+            user=self.users['reader'], author=self.users['max']
+        )
+        response = self.client.get(
+            reverse('profile', args=['leo']),
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(
+            [
+                suggestion.author.username
+                for suggestion in response.context['suggestions']
+            ],
+            ['ann']
+        )
+
+    def test_guest_sees_no_suggestions(self):
+        self.client.logout()
+        response = self.client.get(reverse('profile', args=['leo']))
+        self.assertEqual(response.context['suggestions'], [])
@@ -0,0 +1,115 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import tasks
+from posts.models import Task
+
+CALLS = []
+
+
+def record(value, suffix=''):
+    CALLS.append(value + suffix)
+
+
+def fail():
+    raise RuntimeError('сбой')
+
+
+def touch(path):
+    with open(path, 'w') as file:
+        file.write('готово')
+
+
+class TasksTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+        self.worker = tasks.Worker(workers=0)
+
+    def test_defer_checks_call(self):
+        with self.assertRaises(ValueError):
+            tasks.defer(lambda: None)
+        with self.assertRaises(ValueError):
+            tasks.defer('posts.tests.test_tasks.missing')
+        with self.assertRaises(TypeError):
+            tasks.defer(record, object())
+        self.assertFalse(Task.objects.exists())
+
+    def test_priority_and_delay(self):
+        tasks.defer(record, 'low')
+        tasks.defer(record, 'high', priority=5, suffix='!')
+        tasks.defer('posts.tests.test_tasks.record', 'later', delay=60)
+        self.assertEqual(self.worker.run(once=True), (2, 0))
+        self.assertEqual(CALLS, ['high!', 'low'])
+        self.assertEqual(
+            list(Task.objects.values_list('args', flat=True)),
+            ['[["later"], {}]']
+        )
+
+    def test_retries_then_gives_up(self):
+        task = tasks.defer(fail, max_attempts=2)
+        self.assertEqual(self.worker.run(once=True), (0, 1))
+        task.refresh_from_db()
+        self.assertEqual(task.attempts, 1)
+        self.assertFalse(task.failed)
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertIn('RuntimeError: сбой', task.error)
+        # Время повтора подошло.
+        Task.objects.update(run_after=timezone.now())
+        self.assertEqual(self.worker.run(once=True), (0, 2))
+        task.refresh_from_db()
+        self.assertEqual(task.attempts, 2)
+        self.assertTrue(task.failed)
+        Task.objects.update(run_after=timezone.now())
+        self.assertEqual(self.worker.run(once=True), (0, 2))
+
+    def test_key_keeps_one_pending_task(self):
+        first = tasks.defer(fail, key='same', max_attempts=1)
+        self.assertEqual(tasks.defer(fail, key='same'), first)
+        self.assertEqual(Task.objects.count(), 1)
+        self.worker.run(once=True)
+        # Провалившаяся задача не мешает поставить новую.
+        self.assertNotEqual(tasks.defer(fail, key='same'), first)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_visibility_timeout(self):
+        tasks.defer(record, 'slow')
+        [lost] = tasks.claim(10)
+        self.assertEqual(tasks.claim(10), [])
+        # Обработчик не уложился в тайм-аут, задачу берёт другой.
+        Task.objects.update(run_after=timezone.now() - timedelta(seconds=1))
+        [retried] = tasks.claim(10)
+        self.assertEqual(retried.attempts, 2)
+        tasks.finish(lost)
+        self.assertTrue(Task.objects.exists())
+        tasks.finish(retried)
+        self.assertFalse(Task.objects.exists())
+
+    def test_lost_last_attempt_fails_task(self):
+        task = tasks.defer(record, 'killed', max_attempts=2)
+        for _ in range(2):
+            self.assertEqual(len(tasks.claim(10)), 1)
+            # Обработчик убит, не дойдя до finish().
+            Task.objects.update(
+                run_after=timezone.now() - timedelta(seconds=1)
+            )
+        self.assertEqual(tasks.claim(10), [])
+        task.refresh_from_db()
+        self.assertTrue(task.failed)
+        self.assertEqual(task.attempts, 2)
+        self.assertIn('тайм-аут', task.error)
+
+    def test_command_runs_tasks_in_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'done.txt')
+            tasks.defer(touch, path)
+            output = StringIO()
+            call_command('run_tasks', once=True, workers=1, stdout=output)
+            self.assertTrue(os.path.exists(path))
+        self.assertIn('Выполнено задач: 1, ошибок: 0', output.getvalue())
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,100 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Post, PostHeat, TrendingPost
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='leo')
+        self.quiet, self.busy, self.cold = (
+            Post.objects.create(text=text, author=self.author)
+            for text in ('Тихий пост', 'Горячий пост', 'Старый спор')
+        )
+
+    def comment(self, post, age=None):
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='Комментарий'
+        )
+        if age is not None:
+            comment.created = timezone.now() - age
+            Comment.objects.filter(pk=comment.pk).update(
+                created=comment.created
+            )
+        return comment
+
+    def test_comments_update_heat(self):
+        self.comment(self.busy)
+        self.comment(self.busy)
+        comment = self.comment(self.quiet)
+        self.assertAlmostEqual(
+            PostHeat.objects.get(post=self.busy).score, 2, places=2
+        )
+        comment.delete()
+        self.assertAlmostEqual(
+            PostHeat.objects.get(post=self.quiet).score, 0, places=2
+        )
+
+    def test_refresh_ranks_by_decayed_score(self):
+        half_life = timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        for _ in range(3):
+            self.comment(self.cold, age=half_life * 2)
+        self.comment(self.busy)
+        # Оценки старых комментариев посчитает только rebuild.
+        self.assertEqual(trending.rebuild(), 2)
+        PostHeat.objects.create(
+            post=self.quiet, score=1,
+            updated=time.time() - settings.TRENDING_HALF_LIFE * 10
+        )
+        self.assertEqual(trending.refresh(), 2)
+        ranking = list(TrendingPost.objects.values_list('post', 'score'))
+        self.assertEqual(
+            [post for post, _ in ranking], [self.busy.pk, self.cold.pk]
+        )
+        self.assertAlmostEqual(ranking[1][1], 0.75, places=2)
+        # Остывший пост удалён из оценок.
+        self.assertFalse(PostHeat.objects.filter(post=self.quiet).exists())
+
+    @override_settings(TRENDING_SIZE=1, TRENDING_HALF_LIFE=60)
+    def test_settings_read_at_call_time(self):
+        self.comment(self.busy)
+        self.comment(self.quiet, age=timedelta(minutes=2))
+        self.assertEqual(trending.rebuild(), 2)
+        self.assertAlmostEqual(
+            PostHeat.objects.get(post=self.quiet).score, 0.25, places=2
+        )
+        self.assertEqual(trending.refresh(), 1)
+        output = StringIO()
+        call_command('refresh_trending', stdout=output)
+        self.assertIn('В рейтинге 1 постов', output.getvalue())
+
+    def test_feed_does_not_read_comments(self):
+        self.comment(self.busy)
+        self.comment(self.busy)
+        self.comment(self.quiet)
+        output = StringIO()
+        call_command('refresh_trending', stdout=output)
+        self.assertIn('В рейтинге 2 постов', output.getvalue())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('trending'))
+        self.assertEqual(
+            list(response.context['page']), [self.busy, self.quiet]
+        )
+        self.assertFalse(
+            [query for query in queries if 'posts_comment' in query['sql']]
+        )
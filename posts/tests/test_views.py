@@ -1,16 +1,25 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO, StringIO
+from unittest import skipUnless
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
 
-from posts.models import Comment, Follow, Group, Post
+from posts import thumbnails
+from posts.models import (AuthorStats, Comment, Follow, Group, Post, Task,
+                          TimelineEntry)
 
 User = get_user_model()
 
@@ -229,6 +238,9 @@ class PaginatorViewsTest(TestCase):
             3: reverse('profile', args=[cls.author.username])
         }
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_contains_ten_records(self):
         """Paginator предоставляет ожидаемое количество постов
          на первую страницую."""
@@ -249,6 +261,97 @@ class PaginatorViewsTest(TestCase):
                     'page'
                 ).object_list), 3)
 
+    def test_cursor_pages_cover_all_posts(self):
+        """Курсорная пагинация проходит все посты вперёд и назад
+         без пропусков и повторов."""
+        for i in PaginatorViewsTest.templates.keys():
+            with self.subTest(i=i):
+                first = self.client.get(self.templates[i]).context['page']
+                second = self.client.get(
+                    self.templates[i], {'cursor': first.next_cursor}
+                ).context['page']
+                self.assertEqual(len(second.object_list), 3)
+                self.assertFalse(second.has_next())
+                ids = [
+                    post.id for post in list(first) + list(second)
+                ]
+                self.assertEqual(len(set(ids)), 13)
+                back = self.client.get(
+                    self.templates[i], {'cursor': second.previous_cursor}
+                ).context['page']
+                self.assertEqual(list(back), list(first))
+                self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        response = self.client.get(self.templates[1], {'cursor': 'broken'})
+        self.assertEqual(len(response.context['page'].object_list), 10)
+
+    def test_first_page_runs_no_count(self):
+        """Первая страница ленты отдаётся без COUNT(*)."""
+        for i in PaginatorViewsTest.templates.keys():
+            with self.subTest(i=i):
+                cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(self.templates[i])
+                self.assertFalse(any(
+                    'COUNT(' in query['sql'] for query in context
+                ))
+                self.assertIsNotNone(response.context['page'].next_cursor)
+
+
+class QueryCountViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.reader)
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test-slug',
+            description='test_description'
+        )
+        cls.post = Post.objects.create(
+            text='test_post',
+            group=cls.group,
+            author=cls.author
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.urls = (
+            reverse('index'),
+            reverse('group', args=[cls.group.slug]),
+            reverse('profile', args=[cls.author.username]),
+            reverse('follow_index'),
+            reverse('post', args=[cls.author.username, cls.post.pk]),
+        )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        return len(context)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        """Число запросов страницы не растёт с числом постов
+         и комментариев на ней."""
+        before = {url: self.count_queries(url) for url in self.urls}
+        for i in range(settings.PER_PAGE):
+            commenter = User.objects.create_user(username=f'commenter{i}')
+            post = Post.objects.create(
+                text=f'test_post{i}',
+                group=self.group,
+                author=self.author
+            )
+            for target in (post, self.post):
+                Comment.objects.create(
+                    post=target, author=commenter, text='test_comment'
+                )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), before[url])
+
 
 class CacheViewsTest(TestCase):
     @classmethod
@@ -268,27 +371,232 @@ class CacheViewsTest(TestCase):
             author=cls.author
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_cache_index(self):
-        """Проверка хранения и очищения кэша для index."""
+        """Новый пост сразу появляется на index, а карточки
+         неизменённых постов берутся из кэша."""
         response = CacheViewsTest.authorized_client.get(reverse('index'))
-        posts = response.content
+        Post.objects.filter(pk=CacheViewsTest.post.pk).update(
+            text='test_changed_without_version'
+        )
         Post.objects.create(
             text='test_new_post',
             author=CacheViewsTest.author,
         )
-        response_old = CacheViewsTest.authorized_client.get(
-            reverse('index')
+        response = CacheViewsTest.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'test_new_post')
+        self.assertContains(response, 'test_post')
+        self.assertNotContains(response, 'test_changed_without_version')
+        cache.clear()
+        response = CacheViewsTest.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'test_changed_without_version')
+
+    def test_edit_invalidates_card(self):
+        """Правка поста, комментарий и переименование группы меняют
+         ключ карточки."""
+        post = CacheViewsTest.post
+        url = reverse('group', args=[CacheViewsTest.group.slug])
+        CacheViewsTest.authorized_client.get(url)
+        CacheViewsTest.authorized_client.post(
+            reverse('post_edit', args=[post.author.username, post.pk]),
+            data={'text': 'test_edited_post', 'group': post.group.pk}
+        )
+        response = CacheViewsTest.authorized_client.get(url)
+        self.assertContains(response, 'test_edited_post')
+        version = Post.objects.get(pk=post.pk).version
+        Comment.objects.create(
+            post=post, author=CacheViewsTest.author, text='test_comment'
         )
-        old_posts = response_old.content
         self.assertEqual(
-            old_posts,
-            posts,
-            'Не возвращает кэшированную страницу.'
+            Post.objects.get(pk=post.pk).version, version + 1
+        )
+        group = Group.objects.get(pk=CacheViewsTest.group.pk)
+        group.title = 'test_renamed_group'
+        group.save()
+        response = CacheViewsTest.authorized_client.get(url)
+        self.assertContains(response, '#test_renamed_group')
+
+    @override_settings(POST_CARD_CACHE_TIMEOUT=0)
+    def test_card_timeout_from_settings(self):
+        """Время жизни карточки берётся из настроек."""
+        client = CacheViewsTest.authorized_client
+        client.get(reverse('index'))
+        Post.objects.filter(pk=CacheViewsTest.post.pk).update(
+            text='test_changed_without_version'
+        )
+        response = client.get(reverse('index'))
+        self.assertEqual(response.context['post_card_timeout'], 0)
+        self.assertContains(response, 'test_changed_without_version')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.author)
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test-slug',
+            description='test_description'
+        )
+        cls.post = Post.objects.create(
+            text='test_post',
+            group=cls.group,
+            author=cls.author
+        )
+        cls.urls = (
+            reverse('index'),
+            reverse('group', args=[cls.group.slug]),
+            reverse('profile', args=[cls.author.username]),
+            reverse('post', args=[cls.author.username, cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_cached(self):
+        """Гость получает сохранённую страницу, пока не было записей."""
+        for url in self.urls:
+            self.client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='test_silent_edit')
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIsNone(response.context)
+                self.assertNotContains(response, 'test_silent_edit')
+
+    def test_unknown_params_share_cached_page(self):
+        """Лишние параметры запроса не создают новых записей в кэше."""
+        self.client.get(self.urls[0])
+        Post.objects.filter(pk=self.post.pk).update(text='test_silent_edit')
+        response = self.client.get(self.urls[0], {'utm_source': 'test'})
+        self.assertIsNone(response.context)
+        response = self.client.get(self.urls[0], {'page': 1})
+        self.assertIsNotNone(response.context)
+
+    def test_writes_bump_generations(self):
+        """Пост, комментарий и подписка сбрасывают страницы гостя."""
+        for url in self.urls:
+            self.client.get(url)
+        self.post.text = 'test_edited_post'
+        self.post.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'test_edited_post')
+        Comment.objects.create(
+            post=self.post, author=self.author, text='test_comment'
+        )
+        self.assertContains(self.client.get(self.urls[3]), 'test_comment')
+        reader = User.objects.create_user(username='test_reader')
+        Follow.objects.create(user=reader, author=self.author)
+        response = self.client.get(self.urls[2])
+        self.assertEqual(response.context['followers_count'], 1)
+
+    def test_authorized_user_bypasses_cache(self):
+        """Авторизованный пользователь всегда получает свежую страницу."""
+        self.client.get(self.urls[0])
+        Post.objects.filter(pk=self.post.pk).update(text='test_silent_edit')
+        response = self.authorized_client.get(self.urls[0])
+        self.assertIsNotNone(response.context)
+
+
+class ConditionalGetViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.group = Group.objects.create(
+            title='test_group',
+            slug='test-slug',
+            description='test_description'
+        )
+        cls.post = Post.objects.create(
+            text='test_post',
+            group=cls.group,
+            author=cls.author
         )
+        cls.urls = (
+            reverse('group', args=[cls.group.slug]),
+            reverse('profile', args=[cls.author.username]),
+            reverse('post', args=[cls.author.username, cls.post.pk]),
+        )
+
+    def setUp(self):
         cache.clear()
-        response_new = CacheViewsTest.authorized_client.get(reverse('index'))
-        new_posts = response_new.content
-        self.assertNotEqual(old_posts, new_posts, 'Нет сброса кэша.')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def assert_not_modified(self, client, url):
+        # Первый ответ выдаёт CSRF-cookie, от которой зависит ETag.
+        client.get(url)
+        etag = client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        # Остаются только запросы сессии и пользователя из middleware.
+        self.assertFalse(
+            [query for query in queries if 'posts_' in query['sql']]
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        return etag
+
+    def test_unchanged_pages_are_not_rendered(self):
+        """Без изменений страница отвечает 304 без запросов к БД."""
+        for client in (self.client, self.authorized_client):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    self.assert_not_modified(client, url)
+
+    def test_writes_change_etag(self):
+        """Пост, комментарий и подписка меняют ETag страниц."""
+        etags = [
+            self.assert_not_modified(self.authorized_client, url)
+            for url in self.urls
+        ]
+        self.post.text = 'test_edited_post'
+        self.post.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertContains(response, 'test_edited_post')
+        etag = self.assert_not_modified(self.authorized_client, self.urls[2])
+        Comment.objects.create(
+            post=self.post, author=self.author, text='test_comment'
+        )
+        response = self.authorized_client.get(
+            self.urls[2], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, 'test_comment')
+        etag = self.assert_not_modified(self.authorized_client, self.urls[1])
+        reader = User.objects.create_user(username='test_reader')
+        Follow.objects.create(user=reader, author=self.author)
+        response = self.authorized_client.get(
+            self.urls[1], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.context['followers_count'], 1)
+
+    def test_etag_depends_on_user(self):
+        """Гость и пользователь получают разные версии страницы."""
+        etag = self.client.get(self.urls[2])['ETag']
+        response = self.authorized_client.get(
+            self.urls[2], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_missing_page_has_no_etag(self):
+        response = self.client.get(
+            reverse('profile', args=['test_nobody'])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
 
 
 class FollowViewsTest(TestCase):
@@ -461,6 +769,75 @@ class FollowViewsTest(TestCase):
             'Новый пост не должен появляться'
         )
 
+    def test_unfollow_prunes_timeline(self):
+        """Отписка удаляет посты автора из ленты подписчика."""
+        client = FollowViewsTest.authorized_user_fol_client
+        user = FollowViewsTest.user_fol
+        author = FollowViewsTest.author
+        client.get(reverse('profile_follow', args=[author.username]))
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=user, author=author).exists()
+        )
+        client.get(reverse('profile_unfollow', args=[author.username]))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=user, author=author).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_merged_on_read(self):
+        """Посты автора с большим числом подписчиков не раскладываются
+         по лентам, а подмешиваются в ленту при чтении."""
+        client = FollowViewsTest.authorized_user_fol_client
+        user = FollowViewsTest.user_fol
+        author = FollowViewsTest.author
+        client.get(reverse('profile_follow', args=[author.username]))
+        self.assertTrue(AuthorStats.objects.get(user=author).pull)
+        new_post = Post.objects.create(text='test_new_post', author=author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=user, author=author).exists()
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('follow_index'))
+        self.assertIn(new_post, response.context['page'].object_list)
+        # Чтение ленты ничего не пишет.
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ])
+        self.assertIn(
+            FollowViewsTest.post, response.context['page'].object_list
+        )
+
+    def test_pulled_posts_paginate_with_timeline(self):
+        """Посты pull-авторов и записи ленты листаются вместе, по
+         порядку, без пропусков и повторов."""
+        client = FollowViewsTest.authorized_user_fol_client
+        user = FollowViewsTest.user_fol
+        star = User.objects.create_user(username='test_star')
+        AuthorStats.objects.filter(user=star).update(pull=True)
+        Follow.objects.create(user=user, author=FollowViewsTest.author)
+        Follow.objects.create(user=user, author=star)
+        for i in range(12):
+            Post.objects.create(
+                text=f'test_post{i}',
+                author=star if i % 3 else FollowViewsTest.author
+            )
+        expected = list(Post.objects.filter(
+            author__in=[FollowViewsTest.author, star]
+        ).order_by('-pub_date', '-id'))
+        cache.clear()
+        first = client.get(reverse('follow_index')).context['page']
+        second = client.get(
+            reverse('follow_index'), {'cursor': first.next_cursor}
+        ).context['page']
+        self.assertEqual(list(first) + list(second), expected)
+        numbered = client.get(
+            reverse('follow_index'), {'page': 2}
+        ).context['page']
+        self.assertEqual(numbered.paginator.count, len(expected))
+        self.assertEqual(list(numbered), expected[10:])
+
 
 class CommentViewsTest(TestCase):
     @classmethod
@@ -571,3 +948,163 @@ class CommentViewsTest(TestCase):
                 text=form_data['text']
             ).exists()
         )
+
+    def test_comments_are_paginated(self):
+        """Под постом новые комментарии, остальные - по курсору."""
+        cache.clear()
+        post = Post.objects.create(text='test_busy_post', author=self.author)
+        total = settings.COMMENTS_PER_PAGE + 3
+        for number in range(total):
+            Comment.objects.create(
+                post=post, author=self.auth_user, text=f'test_comment_{number}'
+            )
+        url = reverse('post', args=[self.author.username, post.pk])
+        with CaptureQueriesContext(connection) as busy:
+            response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertIsInstance(comments, QuerySet)
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'test_comment_{number}' for number in range(
+                total - 1, total - 1 - settings.COMMENTS_PER_PAGE, -1
+            )]
+        )
+        seen = [comment.pk for comment in comments]
+        cursor = response.context['next_cursor']
+        self.assertContains(response, cursor)
+        while cursor:
+            response = self.guest_client.get(
+                reverse('post_comments', args=[self.author.username, post.pk]),
+                {'cursor': cursor}
+            )
+            seen.extend(comment.pk for comment in response.context['comments'])
+            cursor = response.context['next_cursor']
+        self.assertEqual(
+            seen,
+            list(post.comments.order_by('-created', '-id').values_list(
+                'pk', flat=True
+            ))
+        )
+        # Число запросов не зависит от числа комментариев.
+        with CaptureQueriesContext(connection) as quiet:
+            self.guest_client.get(
+                reverse('post', args=[self.author.username, self.post.pk])
+            )
+        self.assertEqual(len(busy), len(quiet))
+
+    def test_comments_invalid_cursor(self):
+        response = self.guest_client.get(
+            reverse(
+                'post_comments', args=[self.author.username, self.post.pk]
+            ),
+            {'cursor': 'broken'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(
+            text='Записки о горных походах',
+            author=cls.author
+        )
+        cls.other_post = Post.objects.create(
+            text='Рецепт пирога',
+            author=cls.author
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.other_post,
+            author=cls.author,
+            text='Пирог вышел как после похода'
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('search'), {'q': query, **params})
+        return response.context['hits'], response.context['next_cursor']
+
+    def test_search_finds_posts_and_comments(self):
+        """Поиск находит посты и комментарии по префиксу слова."""
+        hits, _ = self.search('поход')
+        self.assertEqual(len(hits), 2)
+        self.assertIn((self.post, None), hits)
+        self.assertIn((self.other_post, self.comment), hits)
+        self.assertEqual(self.search('')[0], [])
+        self.assertEqual(self.search('"*()')[0], [])
+
+    def test_index_follows_writes(self):
+        """Правка и удаление сразу видны в поиске."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Теперь про озёра'
+        post.save()
+        self.assertEqual(self.search('горных')[0], [])
+        self.assertEqual(len(self.search('озёра')[0]), 1)
+        Comment.objects.filter(pk=self.comment.pk).delete()
+        self.assertEqual(self.search('вышел')[0], [])
+
+    def test_search_pagination(self):
+        """Курсор ведёт на следующую страницу результатов без повторов."""
+        for i in range(settings.PER_PAGE + 2):
+            Post.objects.create(text=f'Поход номер {i}', author=self.author)
+        first, cursor = self.search('поход')
+        second, last_cursor = self.search('поход', cursor=cursor)
+        self.assertEqual(len(first), settings.PER_PAGE)
+        self.assertEqual(len(second), 4)
+        self.assertIsNone(last_cursor)
+        self.assertFalse(set(first) & set(second))
+
+    def test_rebuild_search_index(self):
+        """rebuild_search_index восстанавливает индекс по данным БД."""
+        Post.objects.filter(pk=self.post.pk).update(text='Тихое обновление')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('тихое')[0]), 1)
+        self.assertEqual(self.search('горных')[0], [])
+
+
+@skipUnless(hasattr(Image, 'ANTIALIAS'), 'sorl-thumbnail 12.6 needs Pillow<10')
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class ThumbnailViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        image = BytesIO()
+        Image.new('RGB', (100, 50), color=(200, 0, 0)).save(image, 'PNG')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.author,
+            image=SimpleUploadedFile('image.png', image.getvalue())
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, на странице заглушка, а не Pillow в запросе."""
+        response = self.client.get(reverse('index'))
+        self.assertNotContains(response, '<img class="card-img"')
+        self.assertContains(response, 'card-img bg-light')
+        # Миниатюры заказаны фоновой задачей.
+        self.assertTrue(
+            Task.objects.filter(name='posts.thumbnails.render').exists()
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(
+            thumbnails.render(
+                settings.MEDIA_ROOT, post.pk, post.image.name,
+                thumbnails.jobs(post)
+            ),
+            len(thumbnails.SIZES)
+        )
+        self.assertEqual(thumbnails.jobs(post), [])
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<img class="card-img"')
+        self.assertContains(response, '.webp 1920w')
+        self.assertNotContains(response, 'card-img bg-light')
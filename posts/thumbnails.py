@@ -0,0 +1,159 @@
+"""
+Миниатюры изображений постов, которые готовятся заранее.
+
+sorl-thumbnail рисует миниатюру при первом показе страницы, и этот
+запрос ждёт Pillow. Здесь миниатюры всех размеров из SIZES заказываются
+сразу после сохранения поста фоновой задачей (posts/tasks.py) и
+рисуются в процессах ./manage.py run_tasks. Пока
+миниатюры нет, шаблон показывает заглушку; готовая миниатюра увеличивает
+версию поста, поэтому карточка и страницы перерисовываются сами.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import tasks
+
+# Картинка карточки поста: JPEG для src и варианты WebP разной ширины
+# для srcset, из которых браузер скачивает только подходящий экрану.
+CARD_WIDTH, CARD_HEIGHT = 960, 339
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+CARD_WIDTHS = (480, 960, 1920)
+CARD_VARIANTS = tuple(
+    (
+        width,
+        f'{width}x{round(width * CARD_HEIGHT / CARD_WIDTH)}',
+        dict(CARD_OPTIONS, format='WEBP', quality=80)
+    )
+    for width in CARD_WIDTHS
+)
+
+# Размеры, которые используют шаблоны: (геометрия, опции).
+SIZES = ((f'{CARD_WIDTH}x{CARD_HEIGHT}', CARD_OPTIONS),) + tuple(
+    (geometry, options) for _, geometry, options in CARD_VARIANTS
+)
+
+# Сколько секунд повторный заказ тех же миниатюр считается лишним.
+SCHEDULE_TIMEOUT = 60
+# Приоритет задачи: автор ждёт картинку на только что сохранённом посте.
+PRIORITY = 10
+
+
+def _thumbnail(file_, geometry, options):
+    """Файл миниатюры с именем, которое для неё выберет sorl-thumbnail."""
+    backend = default.backend
+    source = ImageFile(file_)
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage), options
+
+
+def jobs(post):
+    """Миниатюры поста, которых ещё нет: [(имя, геометрия, опции)]."""
+    missing = []
+    for geometry, options in SIZES:
+        thumbnail, options = _thumbnail(post.image, geometry, options)
+        if not thumbnail.exists():
+            missing.append((thumbnail.name, geometry, options))
+    return missing
+
+
+def render(media_root, post_id, source_name, jobs):
+    """
+    Рисует миниатюры в рабочем процессе и увеличивает версию поста.
+    Возвращает число нарисованных миниатюр.
+    """
+    storage = FileSystemStorage(location=media_root)
+    try:
+        image = default.engine.get_image(ImageFile(source_name, storage))
+    except OSError:
+        return 0
+    rendered = 0
+    try:
+        image_info = default.engine.get_image_info(image)
+        for name, geometry, options in jobs:
+            thumbnail = ImageFile(name, storage)
+            if thumbnail.exists():
+                continue
+            default.backend._create_thumbnail(
+                image, geometry, dict(options, image_info=image_info),
+                thumbnail
+            )
+            rendered += 1
+    finally:
+        default.engine.cleanup(image)
+    if rendered:
+        # Модуль загружается в рабочем процессе до django.setup(),
+        # поэтому модели импортируются только здесь.
+        from . import caching
+        caching.bump_post_version(post_id)
+        caching.invalidate_post(post_id)
+    return rendered
+
+
+def schedule(post):
+    """
+    Заказывает недостающие миниатюры поста. Задача записывается в
+    текущую транзакцию и без поста не появится.
+    """
+    if not post.image:
+        return
+    if not cache.add(f'thumbnails:{post.image.name}', True, SCHEDULE_TIMEOUT):
+        return
+    missing = jobs(post)
+    if missing:
+        tasks.defer(
+            render, settings.MEDIA_ROOT, post.pk, post.image.name, missing,
+            priority=PRIORITY, key=f'thumbnails:{post.image.name}'
+        )
+
+
+def ready(post, geometry, **options):
+    """
+    Готовая миниатюра изображения поста или None, если её ещё рисуют.
+    Сама функция изображение не декодирует.
+    """
+    if not post.image:
+        return None
+    thumbnail, _ = _thumbnail(post.image, geometry, options)
+    cached = default.kvstore.get(thumbnail)
+    if cached:
+        return cached
+    if thumbnail.exists():
+        # Нарисована заранее: get_thumbnail только запишет её в kvstore.
+        return default.backend.get_thumbnail(post.image, geometry, **options)
+    schedule(post)
+    return None
+
+
+def card_image(post):
+    """
+    Картинка карточки: {'src': ..., 'srcset': ...} или None, пока
+    миниатюра ещё не готова.
+    """
+    geometry, options = SIZES[0]
+    fallback = ready(post, geometry, **options)
+    if fallback is None:
+        return None
+    variants = [
+        (width, ready(post, geometry, **options))
+        for width, geometry, options in CARD_VARIANTS
+    ]
+    srcset = ''
+    if all(variant is not None for _, variant in variants):
+        srcset = ', '.join(
+            f'{variant.url} {width}w' for width, variant in variants
+        )
+    return {'src': fallback.url, 'srcset': srcset}
@@ -0,0 +1,276 @@
+"""
+Лента подписок с раскладкой при записи (fan-out on write).
+
+Новый пост сразу копируется в TimelineEntry каждого подписчика автора,
+поэтому чтение ленты - это один проход по индексу (user, pub_date).
+Авторы с очень большим числом подписчиков переводятся в режим pull
+(AuthorStats.pull): их посты никуда не копируются, а подмешиваются в
+ленту при чтении, по проходу индекса (author, pub_date) на автора.
+Чтение ленты ничего не пишет.
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginators import TIMELINE_ORDERING, newer
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _entries_for_posts(user_id, posts):
+    return (
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date
+        )
+        for post_id, author_id, pub_date in posts.values_list(
+            'id', 'author_id', 'pub_date'
+        ).iterator()
+    )
+
+
+def _recent_posts(author_id):
+    return Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    )[:settings.TIMELINE_BACKFILL]
+
+
+def pulled_authors(author_ids):
+    """
+    Авторы из author_ids в режиме pull. Автор, набравший
+    TIMELINE_FANOUT_LIMIT подписчиков, переводится в него здесь же
+    одним UPDATE по первичному ключу и остаётся в нём: его посты за
+    это время есть только в Post.
+    """
+    stats = AuthorStats.objects.filter(user_id__in=author_ids)
+    stats.filter(
+        pull=False, followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).update(pull=True)
+    return set(stats.filter(pull=True).values_list('user_id', flat=True))
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """fan_out для пачки постов: запросы - на всю пачку, а не на пост."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    pushed = set(by_author) - pulled_authors(by_author)
+    if not pushed:
+        return
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=author_id,
+            pub_date=post.pub_date
+        )
+        for user_id, author_id in Follow.objects.filter(
+            author_id__in=pushed
+        ).values_list('user_id', 'author_id').iterator()
+        for post in by_author[author_id]
+    )
+
+
+def backfill(follow):
+    """Добавляет в ленту подписчика последние посты нового автора."""
+    if pulled_authors([follow.author_id]):
+        return
+    _bulk_insert(
+        _entries_for_posts(follow.user_id, _recent_posts(follow.author_id))
+    )
+
+
+def prune(follow):
+    """Убирает из ленты посты автора, от которого отписались."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id
+    ).delete()
+
+
+def _post_field(name):
+    # Поля записи ленты в терминах Post.
+    return name[len('post__'):] if name.startswith('post__') else name
+
+
+class Feed:
+    """
+    Лента подписок: записи TimelineEntry и посты авторов в режиме pull,
+    слитые по ключу сортировки. Умеет то, что от queryset нужно
+    пагинаторам, API и newer(): order_by, filter, using, срезы, count и
+    values_list. Каждый источник читается со своим LIMIT по своему
+    индексу, слияние идёт в памяти. Посты pull-авторов отдаются как
+    несохранённые TimelineEntry.
+    """
+    model = TimelineEntry
+
+    def __init__(self, user_id, sources, ordering=TIMELINE_ORDERING,
+                 start=0, stop=None, fields=None, flat=False):
+        self.user_id = user_id
+        self.sources = sources
+        self.ordering = tuple(ordering)
+        self.start = start
+        self.stop = stop
+        self.fields = fields
+        self.flat = flat
+        self._rows = None
+
+    def _clone(self, sources=None, **changes):
+        state = {
+            'ordering': self.ordering, 'start': self.start,
+            'stop': self.stop, 'fields': self.fields, 'flat': self.flat,
+        }
+        state.update(changes)
+        return Feed(self.user_id, sources or self.sources, **state)
+
+    @property
+    def db(self):
+        return self.sources[0].db
+
+    def using(self, alias):
+        return self._clone([source.using(alias) for source in self.sources])
+
+    def order_by(self, *ordering):
+        return self._clone(
+            [source.order_by(*ordering) for source in self.sources],
+            ordering=ordering
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._clone(
+            [source.filter(*args, **kwargs) for source in self.sources]
+        )
+
+    def values_list(self, *fields, flat=False):
+        return self._clone(fields=fields, flat=flat)
+
+    def count(self):
+        total = sum(source.count() for source in self.sources)
+        if self.stop is not None:
+            total = min(total, self.stop)
+        return max(total - self.start, 0)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step is not None:
+            raise TypeError('Ленту можно только срезать.')
+        start = self.start + (key.start or 0)
+        stop = self.stop
+        if key.stop is not None:
+            stop = self.start + key.stop
+            if self.stop is not None:
+                stop = min(stop, self.stop)
+        return self._clone(start=start, stop=stop)
+
+    def _entry(self, post):
+        return TimelineEntry(
+            user_id=self.user_id,
+            post=post,
+            author_id=post.author_id,
+            pub_date=post.pub_date
+        )
+
+    def _stream(self, index, source):
+        if self.stop is not None:
+            source = source[:self.stop]
+        if self.fields is None:
+            return source if index == 0 else map(self._entry, source)
+        fields = self.fields
+        if index:
+            fields = [_post_field(name) for name in fields]
+        keys = [name.lstrip('-') for name in self.ordering]
+        return source.values_list(*fields, *keys)
+
+    def _fetch(self):
+        if self.fields is None:
+            key = attrgetter(*(name.lstrip('-') for name in self.ordering))
+        else:
+            width = len(self.fields)
+
+            def key(row):
+                return row[width:]
+        rows = islice(
+            heapq.merge(
+                *(
+                    self._stream(index, source)
+                    for index, source in enumerate(self.sources)
+                ),
+                key=key,
+                reverse=self.ordering[0].startswith('-')
+            ),
+            self.start, self.stop
+        )
+        if self.fields is None:
+            return list(rows)
+        if self.flat:
+            return [row[0] for row in rows]
+        return [row[:width] for row in rows]
+
+    def _result(self):
+        if self._rows is None:
+            self._rows = self._fetch()
+        return self._rows
+
+    def __iter__(self):
+        return iter(self._result())
+
+    def __len__(self):
+        return len(self._result())
+
+    def iterator(self, chunk_size=None):
+        return iter(self)
+
+
+def feed(user):
+    """
+    Лента подписок пользователя, отсортированная по TIMELINE_ORDERING:
+    его записи TimelineEntry и посты подписок в режиме pull.
+    """
+    pulled = list(Follow.objects.filter(
+        user=user, author__stats__pull=True
+    ).values_list('author_id', flat=True))
+    entries = TimelineEntry.objects.filter(user=user)
+    if pulled:
+        # Записи, разложенные до перевода автора в pull, не нужны: его
+        # посты целиком читаются из Post.
+        entries = entries.exclude(author_id__in=pulled)
+    sources = [
+        entries.select_related('post__author', 'post__group')
+    ] + [
+        Post.objects.filter(author_id=author_id).annotate(
+            post_id=F('id')
+        ).select_related('author', 'group')
+        for author_id in pulled
+    ]
+    return Feed(user.id, sources).order_by(*TIMELINE_ORDERING)
+
+
+def newer_posts(user, since, limit):
+    """id постов ленты новее курсора since, самые новые первыми."""
+    return list(
+        newer(feed(user), since, TIMELINE_ORDERING).values_list(
+            'post_id', flat=True
+        )[:limit]
+    )
+
+
+def entry_posts(entries):
+    return [entry.post for entry in entries]
@@ -0,0 +1,123 @@
+"""
+Обсуждаемые посты.
+
+Оценка поста - сумма по его комментариям exp(-RATE * возраст
+комментария): свежий комментарий весит единицу, его вес вдвое
+уменьшается за TRENDING_HALF_LIFE. В PostHeat хранится оценка на момент
+updated, поэтому новый комментарий обновляет её одним атомарным UPDATE:
+score = score * exp(-RATE * (t - updated)) + 1, updated = t.
+
+./manage.py refresh_trending, запускаемая по расписанию, приводит
+оценки к одному моменту, удаляет остывшие строки PostHeat и
+раскладывает лучшие TRENDING_SIZE постов в TrendingPost. Лента
+/trending/ читает только эту маленькую таблицу и Comment не трогает.
+Comment читает лишь rebuild - при первом запуске, чтобы учесть
+комментарии, написанные до появления оценок.
+"""
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Exp
+
+from . import caching
+from .db import insert_rows
+from .models import Comment, PostHeat, TrendingPost
+
+GENERATION = 'trending'
+# Оценка, ниже которой пост считается остывшим: один комментарий
+# остывает до неё примерно за семь периодов полураспада.
+MIN_SCORE = 0.01
+
+
+def _rate():
+    """RATE: вес комментария вдвое уменьшается за TRENDING_HALF_LIFE."""
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def _decayed(moment):
+    """Оценка PostHeat, приведённая к моменту moment."""
+    return F('score') * Exp((F('updated') - Value(moment)) * Value(_rate()))
+
+
+def _add(post_id, moment, weight, create=True):
+    updated = PostHeat.objects.filter(post_id=post_id).update(
+        score=_decayed(moment) + Value(weight), updated=moment
+    )
+    if updated or not create:
+        return
+    try:
+        with transaction.atomic():
+            PostHeat.objects.create(
+                post_id=post_id, score=weight, updated=moment
+            )
+    except IntegrityError:
+        # Строку только что создал параллельный комментарий.
+        _add(post_id, moment, weight, create=False)
+
+
+def record_comment(comment):
+    _add(comment.post_id, comment.created.timestamp(), 1.0)
+
+
+def forget_comment(comment):
+    """Вычитает вклад удалённого комментария."""
+    now = time.time()
+    weight = math.exp(-_rate() * max(now - comment.created.timestamp(), 0))
+    _add(comment.post_id, now, -weight, create=False)
+
+
+def rebuild():
+    """
+    Заново считает PostHeat по ещё не остывшим комментариям.
+    Возвращает число постов с оценкой.
+    """
+    now = time.time()
+    rate = _rate()
+    since = now - math.log(1 / MIN_SCORE) / rate
+    scores = defaultdict(float)
+    for post_id, created in Comment.objects.filter(
+        created__gte=datetime.fromtimestamp(since, timezone.utc)
+    ).values_list('post_id', 'created').iterator():
+        scores[post_id] += math.exp(-rate * max(now - created.timestamp(), 0))
+    with transaction.atomic():
+        PostHeat.objects.all().delete()
+        insert_rows(
+            PostHeat, ('post', 'score', 'updated'),
+            ((post_id, score, now) for post_id, score in scores.items()),
+            1000
+        )
+    return len(scores)
+
+
+def refresh(size=None):
+    """
+    Пересчитывает TrendingPost по PostHeat и удаляет остывшие оценки.
+    size - размер рейтинга, по умолчанию TRENDING_SIZE. Возвращает
+    число постов в рейтинге.
+    """
+    size = size or settings.TRENDING_SIZE
+    now = time.time()
+    heat = PostHeat.objects.annotate(current=_decayed(now))
+    with transaction.atomic():
+        PostHeat.objects.filter(
+            pk__in=heat.filter(current__lt=MIN_SCORE).values('pk')
+        ).delete()
+        top = heat.order_by('-current', '-post_id').values_list(
+            'post_id', 'current'
+        )[:size]
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            TrendingPost(rank=rank, post_id=post_id, score=score)
+            for rank, (post_id, score) in enumerate(top, 1)
+        )
+    caching.bump_generations(GENERATION)
+    return len(top)
+
+
+def entry_posts(entries):
+    return [entry.post for entry in entries]
@@ -1,31 +1,54 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
 
 from yatube import settings
+from yatube.routers import use_primary
 
+from . import (follow_graph, search, suggestions, thumbnails, timeline,
+               trending)
+from .caching import cache_for_anonymous, conditional_page
+from .counters import get_stats
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Follow, Group, Post, TrendingPost, User
+from .paginators import (COMMENT_ORDERING, TIMELINE_ORDERING,
+                         TRENDING_ORDERING, InvalidCursor, encode_cursor,
+                         paginate, seek)
 
 
+@cache_for_anonymous('index')
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(
+        request,
+        Post.objects.select_related('author', 'group')
+    )
     return render(
         request,
         'index.html',
+        {'page': page, 'poll_interval': settings.NEW_POSTS_POLL}
+    )
+
+
+@cache_for_anonymous(trending.GENERATION)
+def trending_posts(request):
+    page = paginate(
+        request,
+        TrendingPost.objects.select_related('post__author', 'post__group'),
+        ordering=TRENDING_ORDERING,
+        transform=trending.entry_posts
+    )
+    return render(
+        request,
+        'trending.html',
         {'page': page}
     )
 
 
+@conditional_page('group:{slug}')
+@cache_for_anonymous('group:{slug}')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    group_list = group.posts.all()
-    paginator = Paginator(group_list, settings.PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, group.posts.select_related('author'))
     return render(
         request,
         'group.html',
@@ -33,13 +56,29 @@ def group_posts(request, slug):
     )
 
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    hits, next_cursor = search.search(
+        query,
+        cursor=request.GET.get('cursor'),
+        limit=settings.PER_PAGE
+    )
+    return render(
+        request,
+        'search.html',
+        {'query': query, 'hits': hits, 'next_cursor': next_cursor}
+    )
+
+
 @login_required
+@use_primary
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('index')
     return render(
         request,
@@ -52,35 +91,35 @@ def new_post(request):
     )
 
 
+@conditional_page('user:{username}', suggestions.GENERATION)
+@cache_for_anonymous('user:{username}')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    follow_count = author.follower.all().count()
-    followers_count = author.following.all().count()
-    following = request.user.is_authenticated and \
-        Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
-    author_posts = author.posts.all()
-    count = author_posts.count()
-    paginator = Paginator(author_posts, settings.PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    stats = get_stats(author)
+    following = follow_graph.follows(request.user.pk, author.pk)
+    page = paginate(request, author.posts.select_related('group'))
     return render(
         request,
         'profile.html',
         {
             'page': page,
-            'count': count,
+            'count': stats.posts_count,
             'author': author,
-            'follow_count': follow_count,
-            'followers_count': followers_count,
-            'following': following
+            'follow_count': stats.following_count,
+            'followers_count': stats.followers_count,
+            'following': following,
+            'suggestions': suggestions.for_user(
+                request.user, settings.SUGGESTIONS_SHOWN
+            ),
         }
     )
 
 
 @login_required
+@use_primary
 def add_comment(request, post_id, username):
     post = get_object_or_404(Post, id=post_id, author__username=username)
     form = CommentForm(request.POST or None)
@@ -105,30 +144,78 @@ def add_comment(request, post_id, username):
     )
 
 
+@conditional_page('post:{post_id}', 'user:{username}')
+@cache_for_anonymous('post:{post_id}', 'user:{username}')
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    follow_count = post.author.follower.all().count()
-    followers_count = post.author.following.all().count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        id=post_id,
+        author__username=username
+    )
+    stats = get_stats(post.author)
     form = CommentForm()
-    author_posts = post.author.posts.all()
-    count = author_posts.count()
-    comments = post.comments.all()
+    # Сразу выводятся только новые комментарии, остальные подгружает
+    # post_comments, поэтому страница не дорожает с их числом.
+    comments = post.comments.select_related('author').order_by(
+        *COMMENT_ORDERING
+    )[:settings.COMMENTS_PER_PAGE]
+    next_cursor = None
+    if comments and post.comments_count > len(comments):
+        next_cursor = encode_cursor(
+            comments[len(comments) - 1], COMMENT_ORDERING, 'next'
+        )
     return render(
         request,
         'post.html',
         {
             'author': post.author,
             'post': post,
-            'count': count,
+            'count': stats.posts_count,
             'comments': comments,
+            'next_cursor': next_cursor,
             'form': form,
-            'follow_count': follow_count,
-            'followers_count': followers_count,
+            'follow_count': stats.following_count,
+            'followers_count': stats.followers_count,
         }
     )
 
 
+@conditional_page('post:{post_id}')
+@cache_for_anonymous('post:{post_id}')
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев поста, фрагмент HTML."""
+    post = get_object_or_404(
+        Post.objects.only('id', 'author__username').select_related(
+            'author'
+        ),
+        id=post_id,
+        author__username=username
+    )
+    comments = post.comments.select_related('author')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            comments = seek(comments, cursor, COMMENT_ORDERING)
+        except InvalidCursor:
+            return HttpResponseBadRequest('Неверный курсор.')
+    comments = list(
+        comments.order_by(*COMMENT_ORDERING)[
+            :settings.COMMENTS_PER_PAGE + 1
+        ]
+    )
+    next_cursor = None
+    if len(comments) > settings.COMMENTS_PER_PAGE:
+        comments = comments[:settings.COMMENTS_PER_PAGE]
+        next_cursor = encode_cursor(comments[-1], COMMENT_ORDERING, 'next')
+    return render(
+        request,
+        'includes/comment_list.html',
+        {'post': post, 'comments': comments, 'next_cursor': next_cursor}
+    )
+
+
 @login_required
+@use_primary
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
     if post.author != request.user:
@@ -144,6 +231,8 @@ def post_edit(request, username, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect(
             'post',
             post_id=post.id,
@@ -163,18 +252,28 @@ def post_edit(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, settings.PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(
+        request,
+        timeline.feed(request.user),
+        ordering=TIMELINE_ORDERING,
+        transform=timeline.entry_posts
+    )
     return render(
         request,
         'follow.html',
-        {'page': page, 'paginator': paginator}
+        {
+            'page': page,
+            'paginator': page.paginator,
+            'suggestions': suggestions.for_user(
+                request.user, settings.SUGGESTIONS_SHOWN
+            ),
+            'poll_interval': settings.NEW_POSTS_POLL,
+        }
     )
 
 
 @login_required
+@use_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author == request.user:
@@ -182,16 +281,8 @@ def profile_follow(request, username):
             'profile',
             username=username
         )
-    follower = Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists()
-    if follower is True:
-        return redirect(
-            'profile',
-            username=username
-        )
-    Follow.objects.create(user=request.user, author=author)
+    # Запись решается по БД: граф в кэше мог отстать.
+    Follow.objects.get_or_create(user=request.user, author=author)
     return redirect(
         'profile',
         username=username
@@ -199,6 +290,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@use_primary
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     if author == request.user:
@@ -0,0 +1,248 @@
+"""
+Замеры времени запросов: заголовок Server-Timing и метрики для Prometheus.
+
+TimingMiddleware замеряет каждый запрос: число запросов к БД и их время
+(через execute_wrapper), время рендеринга шаблонов (через шаблонный
+бэкенд TimedDjangoTemplates) и общее время. Замеры складываются в
+гистограммы по имени view, а при DEBUG и для сотрудников ответ ещё
+получает заголовок Server-Timing. Потоковый ответ читает базу, пока
+отдаётся тело, поэтому его замер заканчивается вместе с потоком, а
+заголовок, ушедший раньше тела, ему не ставится.
+
+Гистограммы копятся в памяти процесса и не чаще раза в METRICS_FLUSH
+секунд сохраняются в общий кэш, по ключу на процесс. Страница
+/metrics/ складывает снимки всех живых процессов. Так на запрос
+приходится несколько сложений в памяти, а не обращения к кэшу.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends import django as django_backend
+
+# Границы корзин гистограммы задержки, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROCESSES_KEY = 'metrics:processes'
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    __slots__ = ('queries', 'db', 'templates')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.templates = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper: замеряет каждый запрос к БД.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+class _Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.templates += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(django_backend.DjangoTemplates):
+    """DjangoTemplates, которые учитывают время рендеринга в запросе."""
+
+    def from_string(self, template_code):
+        return _Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return _Template(template.template, self)
+
+
+def _empty():
+    return {
+        'buckets': [0] * (len(BUCKETS) + 1),
+        'count': 0,
+        'seconds': 0.0,
+        'db_queries': 0,
+        'db_seconds': 0.0,
+        'template_seconds': 0.0,
+    }
+
+
+class Histograms:
+    """Гистограммы задержки и суммы замеров по view одного процесса."""
+
+    def __init__(self):
+        self.views = {}
+        self.lock = threading.Lock()
+        self.flushed = 0.0
+
+    def observe(self, view, total, timing):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = _empty()
+            stats['buckets'][bisect_left(BUCKETS, total)] += 1
+            stats['count'] += 1
+            stats['seconds'] += total
+            stats['db_queries'] += timing.queries
+            stats['db_seconds'] += timing.db
+            stats['template_seconds'] += timing.templates
+            now = time.monotonic()
+            if now - self.flushed < settings.METRICS_FLUSH:
+                return
+            self.flushed = now
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            snapshot = {
+                view: dict(stats, buckets=list(stats['buckets']))
+                for view, stats in self.views.items()
+            }
+        pid = os.getpid()
+        cache.set(f'metrics:{pid}', snapshot, settings.METRICS_TTL)
+        processes = cache.get(PROCESSES_KEY, set())
+        if pid not in processes:
+            cache.set(PROCESSES_KEY, processes | {pid}, None)
+
+
+histograms = Histograms()
+
+
+def _server_timing(total, timing):
+    return ', '.join((
+        f'db;dur={timing.db * 1000:.1f};desc="{timing.queries} queries"',
+        f'tpl;dur={timing.templates * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ))
+
+
+class TimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def _measure(timing):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timing))
+        return stack
+
+    def _stream(self, content, view, started, timing):
+        iterator = iter(content)
+        try:
+            while True:
+                token = _current.set(timing)
+                try:
+                    with self._measure(timing):
+                        chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            histograms.observe(view, time.perf_counter() - started, timing)
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            with self._measure(timing):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        if response.streaming:
+            response.streaming_content = self._stream(
+                response.streaming_content, view, started, timing
+            )
+            return response
+        total = time.perf_counter() - started
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or user is not None and user.is_staff:
+            response['Server-Timing'] = _server_timing(total, timing)
+        histograms.observe(view, total, timing)
+        return response
+
+
+def collect():
+    """Снимки гистограмм всех процессов, сложенные по view."""
+    processes = cache.get(PROCESSES_KEY, set())
+    snapshots = cache.get_many([f'metrics:{pid}' for pid in processes])
+    alive = {pid for pid in processes if f'metrics:{pid}' in snapshots}
+    if alive != processes:
+        cache.set(PROCESSES_KEY, alive, None)
+    merged = {}
+    for snapshot in snapshots.values():
+        for view, stats in snapshot.items():
+            total = merged.setdefault(view, _empty())
+            for key, value in stats.items():
+                if key == 'buckets':
+                    total[key] = [a + b for a, b in zip(total[key], value)]
+                else:
+                    total[key] += value
+    return merged
+
+
+def render_metrics(views):
+    lines = [
+        '# HELP yatube_request_seconds Request latency by view.',
+        '# TYPE yatube_request_seconds histogram',
+    ]
+    for view, stats in sorted(views.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), stats['buckets']):
+            cumulative += count
+            lines.append(
+                f'yatube_request_seconds_bucket{{view="{view}",'
+                f'le="{bound}"}} {cumulative}'
+            )
+        lines.append(
+            f'yatube_request_seconds_sum{{view="{view}"}} '
+            f'{stats["seconds"]:.6f}'
+        )
+        lines.append(
+            f'yatube_request_seconds_count{{view="{view}"}} {stats["count"]}'
+        )
+    for name, kind, key, text in (
+        ('db_queries_total', 'counter', 'db_queries', 'DB queries'),
+        ('db_seconds_total', 'counter', 'db_seconds', 'Time spent in DB'),
+        ('template_seconds_total', 'counter', 'template_seconds',
+         'Time spent rendering templates'),
+    ):
+        lines.append(f'# HELP yatube_{name} {text} by view.')
+        lines.append(f'# TYPE yatube_{name} {kind}')
+        for view, stats in sorted(views.items()):
+            lines.append(f'yatube_{name}{{view="{view}"}} {stats[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    histograms.flush()
+    return HttpResponse(
+        render_metrics(collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
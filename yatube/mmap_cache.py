@@ -0,0 +1,291 @@
+"""
+Кэш в memory-mapped файле, общий для всех процессов на машине.
+
+Файл поделён на наборы (sets) по WAYS слотов фиксированного размера,
+как кэш процессора: ключ попадает в набор по своему хэшу, внутри набора
+вытесняется давно не использованный слот (LRU). Каждый набор защищён
+своей блокировкой fcntl на диапазон байт, поэтому процессы, работающие
+с разными наборами, друг другу не мешают, а incr/decr атомарны.
+
+Настройки (CACHES[...]['OPTIONS']):
+    MAX_ENTRIES - число слотов (по умолчанию 4096);
+    SLOT_SIZE   - размер слота в байтах, значения больше не кэшируются
+                  (по умолчанию 64 КБ);
+    WAYS        - число слотов в наборе (по умолчанию 8).
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+MAGIC = b'YTMC0001'
+HEADER = struct.Struct('<8sIII')
+HEADER_SIZE = 64
+SLOT = struct.Struct('<16sdQI')
+SLOT_HEADER_SIZE = 48
+EMPTY_DIGEST = bytes(16)
+
+_attached = {}
+_attached_guard = threading.Lock()
+
+
+def _create(path, size, header):
+    """
+    Создаёт файл кэша, если его ещё нет. Файл готовится под временным
+    именем и появляется под path уже размеченным (os.link не заменяет
+    существующий файл), поэтому другой процесс не увидит его пустым.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix='.yatube-cache-')
+    try:
+        os.ftruncate(fd, size)
+        os.pwrite(fd, header, 0)
+        try:
+            os.link(temporary, path)
+        except FileExistsError:
+            pass
+    finally:
+        os.close(fd)
+        os.unlink(temporary)
+
+
+def _attach(path, size, header):
+    """
+    Открывает файл кэша и отображает его в память, один раз на процесс.
+
+    Файл с другой разметкой не переделывается: его могут отображать
+    другие процессы, и обрезанный файл убьёт их по SIGBUS. Чтобы сменить
+    настройки, файл удаляют, когда процессы с прежними настройками
+    остановлены.
+
+    Блокировки fcntl принадлежат процессу, а не потоку, поэтому потоки
+    процесса дополнительно разделяют общий threading.Lock. После fork
+    файл открывается заново, чтобы у дочернего процесса были свои
+    блокировки.
+    """
+    key = (os.getpid(), path)
+    with _attached_guard:
+        if key in _attached:
+            return _attached[key]
+        if not os.path.exists(path):
+            _create(path, size, header)
+        fd = os.open(path, os.O_RDWR)
+        if os.pread(fd, len(header), 0) != header or \
+                os.fstat(fd).st_size != size:
+            os.close(fd)
+            raise ImproperlyConfigured(
+                f'{path} was created with other cache OPTIONS; remove it '
+                f'after stopping the processes that use it'
+            )
+        _attached[key] = (fd, mmap.mmap(fd, size), threading.Lock())
+        return _attached[key]
+
+
+class _SetLock:
+    """Блокировка набора: между потоками процесса и между процессами."""
+
+    def __init__(self, cache, start, length):
+        self.cache = cache
+        self.start = start
+        self.length = length
+
+    def __enter__(self):
+        self.cache._lock.acquire()
+        fcntl.lockf(
+            self.cache._fd, fcntl.LOCK_EX, self.length, self.start
+        )
+
+    def __exit__(self, *exc_info):
+        fcntl.lockf(
+            self.cache._fd, fcntl.LOCK_UN, self.length, self.start
+        )
+        self.cache._lock.release()
+
+
+class MmapCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._ways = int(options.get('WAYS', 8))
+        self._slot_size = int(options.get('SLOT_SIZE', 64 * 1024))
+        if self._slot_size <= SLOT_HEADER_SIZE:
+            raise ValueError('SLOT_SIZE is too small')
+        self._sets = max(1, self._max_entries // self._ways)
+        self._size = HEADER_SIZE + self._sets * self._ways * self._slot_size
+        self._pid = None
+        self._fd = None
+        self._map = None
+        self._lock = None
+
+    def _open(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._fd, self._map, self._lock = _attach(
+            self._path,
+            self._size,
+            HEADER.pack(MAGIC, self._sets, self._ways, self._slot_size)
+        )
+
+    def _locate(self, key, version):
+        """Хэш ключа и блокировка набора, в который он попадает."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._open()
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        index = int.from_bytes(digest[:8], 'little') % self._sets
+        start = HEADER_SIZE + index * self._ways * self._slot_size
+        return digest, _SetLock(self, start, self._ways * self._slot_size)
+
+    def _slots(self, lock):
+        return range(lock.start, lock.start + lock.length, self._slot_size)
+
+    def _read_header(self, offset):
+        return SLOT.unpack_from(self._map, offset)
+
+    def _find(self, lock, digest, now):
+        for offset in self._slots(lock):
+            slot_digest, expires, _, length = self._read_header(offset)
+            if slot_digest != digest:
+                continue
+            if expires and expires <= now:
+                self._clear_slot(offset)
+                return None
+            return offset
+        return None
+
+    def _victim(self, lock, now):
+        victim, oldest = None, None
+        for offset in self._slots(lock):
+            digest, expires, used, _ = self._read_header(offset)
+            if digest == EMPTY_DIGEST or (expires and expires <= now):
+                return offset
+            if oldest is None or used < oldest:
+                victim, oldest = offset, used
+        return victim
+
+    def _clear_slot(self, offset):
+        SLOT.pack_into(self._map, offset, EMPTY_DIGEST, 0, 0, 0)
+
+    def _load(self, offset):
+        length = self._read_header(offset)[3]
+        start = offset + SLOT_HEADER_SIZE
+        return pickle.loads(self._map[start:start + length])
+
+    def _touch_slot(self, offset):
+        digest, expires, _, length = self._read_header(offset)
+        SLOT.pack_into(
+            self._map, offset, digest, expires, time.time_ns(), length
+        )
+
+    def _store(self, lock, digest, value, timeout, now, only_new=False):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self._slot_size - SLOT_HEADER_SIZE:
+            return False
+        offset = self._find(lock, digest, now)
+        if offset is not None and only_new:
+            return False
+        if offset is None:
+            offset = self._victim(lock, now)
+        expires = self.get_backend_timeout(timeout)
+        start = offset + SLOT_HEADER_SIZE
+        self._map[start:start + len(data)] = data
+        SLOT.pack_into(
+            self._map, offset, digest, expires or 0, time.time_ns(),
+            len(data)
+        )
+        return True
+
+    # API BaseCache
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        digest, lock = self._locate(key, version)
+        with lock:
+            return self._store(
+                lock, digest, value, timeout, time.time(), only_new=True
+            )
+
+    def get(self, key, default=None, version=None):
+        digest, lock = self._locate(key, version)
+        with lock:
+            offset = self._find(lock, digest, time.time())
+            if offset is None:
+                return default
+            self._touch_slot(offset)
+            return self._load(offset)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        digest, lock = self._locate(key, version)
+        with lock:
+            if not self._store(lock, digest, value, timeout, time.time()):
+                # Значение не помещается в слот: старое удаляем,
+                # чтобы не отдавать устаревшие данные.
+                offset = self._find(lock, digest, time.time())
+                if offset is not None:
+                    self._clear_slot(offset)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        digest, lock = self._locate(key, version)
+        with lock:
+            offset = self._find(lock, digest, time.time())
+            if offset is None:
+                return False
+            _, _, _, length = self._read_header(offset)
+            SLOT.pack_into(
+                self._map, offset, digest,
+                self.get_backend_timeout(timeout) or 0, time.time_ns(),
+                length
+            )
+            return True
+
+    def delete(self, key, version=None):
+        digest, lock = self._locate(key, version)
+        with lock:
+            offset = self._find(lock, digest, time.time())
+            if offset is not None:
+                self._clear_slot(offset)
+
+    def has_key(self, key, version=None):
+        digest, lock = self._locate(key, version)
+        with lock:
+            return self._find(lock, digest, time.time()) is not None
+
+    def incr(self, key, delta=1, version=None):
+        digest, lock = self._locate(key, version)
+        with lock:
+            now = time.time()
+            offset = self._find(lock, digest, now)
+            if offset is None:
+                raise ValueError('Key not found')
+            expires = self._read_header(offset)[1]
+            value = self._load(offset) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            start = offset + SLOT_HEADER_SIZE
+            self._map[start:start + len(data)] = data
+            SLOT.pack_into(
+                self._map, offset, digest, expires, time.time_ns(),
+                len(data)
+            )
+            return value
+
+    def clear(self):
+        self._open()
+        with _SetLock(self, HEADER_SIZE, self._size - HEADER_SIZE):
+            for offset in range(HEADER_SIZE, self._size, self._slot_size):
+                self._clear_slot(offset)
+
+    def close(self, **kwargs):
+        # Отображение живёт всё время жизни процесса: его открытие
+        # дороже, чем запрос, а закрывать его после каждого ответа
+        # незачем.
+        pass
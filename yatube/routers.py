@@ -0,0 +1,85 @@
+"""
+Чтение с реплик базы данных.
+
+ReplicaRouter отправляет чтения на одну из баз DATABASE_REPLICAS,
+а записи - всегда в основную базу 'default'. С реплик читают только
+запросы, прошедшие через ReplicaMiddleware. Реплика отстаёт от основной
+базы, поэтому после записи чтения возвращаются в основную базу:
+    - до конца текущего запроса;
+    - для того же посетителя на REPLICA_PIN_SECONDS секунд
+      (ReplicaMiddleware ставит cookie);
+    - во всём запросе с методом, меняющим данные, и во view,
+      обёрнутых в use_primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PIN_COOKIE = 'use_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Вне запросов (миграции, команды, shell) всё читается из основной базы.
+_pinned = ContextVar('pinned', default=True)
+_wrote = ContextVar('wrote', default=False)
+
+
+@contextmanager
+def primary():
+    """Все чтения внутри блока идут в основную базу."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def use_primary(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with primary():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or _wrote.get() or not settings.DATABASE_REPLICAS:
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Во всех базах одни и те же данные.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == 'default'
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = _pinned.set(
+            request.method not in SAFE_METHODS
+            or PIN_COOKIE in request.COOKIES
+        )
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() and settings.DATABASE_REPLICAS:
+                response.set_cookie(
+                    PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True, samesite='Lax'
+                )
+            return response
+        finally:
+            _wrote.reset(wrote)
+            _pinned.reset(pinned)
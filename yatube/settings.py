@@ -50,7 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yatube.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,7 +71,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,6 +81,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'posts.context_processors.year',
+                'posts.context_processors.cache_timeouts',
             ],
         },
     },
@@ -97,6 +100,13 @@ DATABASES = {
     }
 }
 
+# Reads may go to replicas listed here, writes always go to 'default',
+# see yatube/routers.py and yatube/settings_replica.py.
+
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -154,10 +164,99 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PER_PAGE = 10
 
+# Comments rendered under a post; older ones are loaded in pages of the
+# same size, see posts.views.post_comments.
+
+COMMENTS_PER_PAGE = 20
+
+# "Who to follow" suggestions shown on the profile and follow pages,
+# see posts/suggestions.py.
+
+SUGGESTIONS_SHOWN = 5
+
+# Trending feed, see posts/trending.py: a comment's weight halves every
+# TRENDING_HALF_LIFE seconds; refresh_trending keeps the best
+# TRENDING_SIZE posts.
+
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_SIZE = 100
+
+# JSON API, see posts/api.py.
+
+API_MAX_LIMIT = 1000
+
+# "New posts" banner on the index and follow pages: the pages poll
+# /api/v1/.../new/ every NEW_POSTS_POLL seconds. Answers are cached for
+# NEW_POSTS_TIMEOUT seconds and count at most NEW_POSTS_LIMIT posts.
+
+NEW_POSTS_POLL = 30
+NEW_POSTS_TIMEOUT = 1
+NEW_POSTS_LIMIT = 99
+
 # Cache
 
+# Shared by every worker of this checkout through a memory-mapped file,
+# see yatube/mmap_cache.py. Tests clear the cache in setUp, so they run
+# with yatube.settings_test and a private in-memory cache instead.
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.mmap_cache.MmapCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH',
+            os.path.join(BASE_DIR, 'cache', 'yatube.cache')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 4096,
+            'SLOT_SIZE': 64 * 1024,
+        },
     }
 }
+
+# Follow timeline
+
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_BACKFILL = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# Page cache for anonymous visitors; pages are invalidated by generation
+# counters, the timeout only frees entries left behind by old generations.
+
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Post cards are keyed on post and group versions, see
+# templates/includes/post_item.html; the timeout only frees stale ones.
+
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Thumbnails are rendered ahead of time by background tasks, see
+# posts/thumbnails.py; THUMBNAIL_WORKERS is the default pool size of
+# ./manage.py generate_thumbnails.
+
+THUMBNAIL_WORKERS = 2
+
+# Background tasks, see posts/tasks.py. Deferred calls are stored in the
+# database and run by ./manage.py run_tasks. A claimed task is offered
+# to another worker if it is not finished within the visibility timeout;
+# failed attempts are retried after TASK_RETRY_DELAY * 2 ** (attempt - 1)
+# seconds.
+
+TASK_WORKERS = 2
+TASK_VISIBILITY_TIMEOUT = 5 * 60
+TASK_RETRY_DELAY = 10
+TASK_MAX_ATTEMPTS = 3
+TASK_POLL_INTERVAL = 1
+
+# Uploaded images, see posts/images.py.
+
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+IMAGE_MAX_SIDE = 2048
+IMAGE_QUALITY = 85
+
+# Request timing, see yatube/metrics.py. Per-process histograms are
+# saved to the cache at most every METRICS_FLUSH seconds and served on
+# /metrics/ to the listed addresses.
+
+METRICS_FLUSH = 1
+METRICS_TTL = 24 * 60 * 60
+METRICS_ALLOWED_IPS = INTERNAL_IPS
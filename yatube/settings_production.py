@@ -0,0 +1,34 @@
+"""
+Настройки для продакшена: DJANGO_SETTINGS_MODULE=yatube.settings_production.
+
+SQLite работает в режиме WAL, поэтому читатели не ждут писателя,
+а соединения живут между запросами (CONN_MAX_AGE) вместе с кэшем
+страниц SQLite и отображением файла в память. Сравнить с настройками
+по умолчанию: ./manage.py bench_sqlite.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES as BASE_DATABASES
+
+# Новый словарь: DATABASES из yatube.settings не должен меняться,
+# если этот модуль импортирован рядом с ним (например, bench_sqlite).
+DATABASES = {'default': {
+    **BASE_DATABASES['default'],
+    'ENGINE': 'yatube.sqlite3',
+    'CONN_MAX_AGE': 600,
+    'OPTIONS': {
+        'timeout': 5,
+        'transaction_mode': 'IMMEDIATE',
+        'pragmas': {
+            'journal_mode': 'WAL',
+            # В режиме WAL NORMAL не портит базу при сбое питания,
+            # теряя лишь последние транзакции, и не ждёт fsync
+            # на каждой фиксации.
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 256 * 1024 * 1024,
+            # Отрицательное значение - в КиБ: 64 МБ на соединение.
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+    },
+}}
@@ -0,0 +1,21 @@
+"""
+Локальная проверка чтения с реплики: DJANGO_SETTINGS_MODULE=
+yatube.settings_replica. Реплика - второй файл SQLite, который
+копируется из основной базы командой ./manage.py refresh_replica
+(например, раз в несколько секунд из cron или цикла в shell).
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+from .settings import DATABASES as BASE_DATABASES
+
+DATABASES = {
+    **BASE_DATABASES,
+    'replica': {
+        **BASE_DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_REPLICAS = ['replica']
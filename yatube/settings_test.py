@@ -0,0 +1,15 @@
+"""
+Настройки для тестов: DJANGO_SETTINGS_MODULE=yatube.settings_test (так
+его задаёт pytest.ini) или ./manage.py test --settings=yatube.settings_test.
+
+Тесты очищают кэш в setUp, поэтому у каждого процесса тестов свой кэш в
+памяти, а файл кэша сайта и соседние прогоны не затрагиваются.
+"""
+from .settings import *  # noqa: F401,F403
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 4096},
+    }
+}
@@ -0,0 +1,48 @@
+"""
+SQLite с настройками соединения для продакшена.
+
+Помимо стандартных OPTIONS модуля sqlite3 понимает:
+    pragmas          - словарь PRAGMA, которые выполняются на каждом
+                       новом соединении (journal_mode, synchronous,
+                       mmap_size, cache_size, busy_timeout...);
+    transaction_mode - чем начинать транзакции atomic(): 'DEFERRED'
+                       (как в Django), 'IMMEDIATE' или 'EXCLUSIVE'.
+
+BEGIN IMMEDIATE берёт блокировку записи сразу. Отложенная транзакция,
+которая сначала читала, а потом пишет, при занятой базе получает
+"database is locked" без ожидания busy_timeout.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        mode = kwargs.pop('transaction_mode', 'DEFERRED')
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode must be one of {TRANSACTION_MODES}'
+            )
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, self.settings_dict['OPTIONS'].get(
+            'pragmas', {}
+        ))
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get(
+            'transaction_mode', 'DEFERRED'
+        )
+        self.cursor().execute(f'BEGIN {mode}')